@@ -0,0 +1,49 @@
+from itertools import count
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from PyQt6.QtWidgets import QApplication
+
+from functino.execute import get_output
+from functino.language import LanguageProfile
+
+
+def bench_get_output(
+    benchmark: BenchmarkFixture,
+    qapp: QApplication,
+    benchmark_profile: tuple[LanguageProfile, str],
+) -> None:
+    """
+    Time to run a trivial program with each profile.
+
+    For compile profiles, the compiled program is cached after the first round, so this
+    measures the overhead of running an already built program.
+    """
+    profile, program = benchmark_profile
+    benchmark.extra_info["profile"] = profile.name
+    benchmark.pedantic(get_output, (profile, program), rounds=10, warmup_rounds=1)
+
+
+def bench_get_output_uncached(
+    benchmark: BenchmarkFixture,
+    qapp: QApplication,
+    benchmark_profile: tuple[LanguageProfile, str],
+) -> None:
+    """
+    Time to compile and run a trivial program with each compile profile.
+
+    Every round uses slightly different code so that the build cache is never hit.
+    """
+    profile, program = benchmark_profile
+    if not profile.compile:
+        pytest.skip("not a compile profile")
+    benchmark.extra_info["profile"] = profile.name
+    round_numbers = count()
+
+    def setup() -> tuple[tuple[LanguageProfile, str], dict]:
+        unique_program = f"{program}\n// {next(round_numbers)} {id(benchmark)}\n"
+        if program.startswith("#!"):
+            unique_program = f"{program}# {next(round_numbers)} {id(benchmark)}\n"
+        return ((profile, unique_program), {})
+
+    benchmark.pedantic(get_output, setup=setup, rounds=5)
@@ -0,0 +1,13 @@
+from pytest_benchmark.fixture import BenchmarkFixture
+from PyQt6.QtWidgets import QApplication
+
+from functino.language import get_language_profiles
+
+
+def bench_get_language_profiles(
+    benchmark: BenchmarkFixture, qapp: QApplication
+) -> None:
+    """
+    Time to load all built-in and user language profiles.
+    """
+    benchmark(get_language_profiles)
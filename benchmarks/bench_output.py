@@ -0,0 +1,29 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from PyQt6.QtWidgets import QApplication
+
+from functino.gui.output import OutputWidget
+
+MEBIBYTE = 1024 * 1024
+
+
+@pytest.mark.parametrize("size_mib", [1, 10, 100])
+def bench_output_rendering(
+    benchmark: BenchmarkFixture, qapp: QApplication, size_mib: int
+) -> None:
+    """
+    Time to display output of the given size in the output panel.
+    """
+    line = "output line with some representative text in it 0123456789\n"
+    output = line * (size_mib * MEBIBYTE // len(line))
+    output_widget = OutputWidget()
+    output_widget.resize(800, 600)
+    output_widget.show()
+
+    def render() -> None:
+        output_widget.clear()
+        output_widget.append_output(output)
+        output_widget.repaint()
+        qapp.processEvents()
+
+    benchmark.pedantic(render, rounds=3 if size_mib < 100 else 1)
@@ -0,0 +1,26 @@
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+COLD_START_SCRIPT = Path(__file__).parent / "cold_start.py"
+
+
+def bench_gui_cold_start(benchmark: BenchmarkFixture) -> None:
+    """
+    Time from starting a fresh interpreter to the first paint of the main window.
+    """
+    first_paint_times = []
+
+    def cold_start() -> None:
+        result = subprocess.run(
+            (sys.executable, str(COLD_START_SCRIPT), str(time.time())),
+            capture_output=True,
+            check=True,
+        )
+        first_paint_times.append(float(result.stdout.split()[-1]))
+
+    benchmark.pedantic(cold_start, rounds=5, warmup_rounds=1)
+    benchmark.extra_info["min_first_paint_seconds"] = min(first_paint_times)
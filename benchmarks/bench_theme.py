@@ -0,0 +1,22 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from functino.gui.theme import Theme
+from functino.project_path import get_themes_path
+
+
+@pytest.mark.parametrize("theme_file_name", ["dark.xml", "light.xml"])
+def bench_theme_parse(benchmark: BenchmarkFixture, theme_file_name: str) -> None:
+    """
+    Time to parse a theme file.
+    """
+    benchmark(Theme, get_themes_path() / theme_file_name)
+
+
+@pytest.mark.parametrize("lexer_name", ["cpp", "python"])
+def bench_get_lexer_color_map(benchmark: BenchmarkFixture, lexer_name: str) -> None:
+    """
+    Time to look up the colors of a lexer in a parsed theme.
+    """
+    theme = Theme(get_themes_path() / "dark.xml")
+    benchmark(theme.get_lexer_color_map, lexer_name)
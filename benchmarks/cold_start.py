@@ -0,0 +1,50 @@
+"""
+Start the GUI and exit as soon as the main window is first painted.
+
+This is run in a fresh interpreter by bench_startup.py so that interpreter startup and
+import time are included. The script's only argument is the wall clock time (as returned
+by time.time) at which the parent process started it; the time from then to the first
+paint is printed in seconds. Without an argument, the time is measured from the first
+line of the script.
+"""
+
+import sys
+import time
+
+start_time = float(sys.argv[1]) if len(sys.argv) > 1 else time.time()
+first_paint_time: float | None = None
+
+from PyQt6.QtCore import QEvent, QObject, QStandardPaths  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from functino.gui.icon import IconSet  # noqa: E402
+from functino.gui.theme import Theme  # noqa: E402
+from functino.gui.window import MainWindow  # noqa: E402
+from functino.project_path import get_themes_path  # noqa: E402
+
+
+class FirstPaintFilter(QObject):
+    """
+    Event filter that quits the application on the first paint event.
+    """
+
+    def eventFilter(self, a0: QObject | None, a1: QEvent | None) -> bool:
+        global first_paint_time
+        if a1 is not None and a1.type() == QEvent.Type.Paint:
+            if first_paint_time is None:
+                first_paint_time = time.time()
+            QApplication.exit()
+        return False
+
+
+QStandardPaths.setTestModeEnabled(True)
+app = QApplication([])
+app.setOrganizationName("functinodev")
+app.setApplicationName("functino")
+first_paint_filter = FirstPaintFilter()
+app.installEventFilter(first_paint_filter)
+main_window = MainWindow(Theme(get_themes_path() / "dark.xml"), IconSet(IconSet.Dark))
+main_window.show()
+app.exec()
+assert first_paint_time is not None
+print(first_paint_time - start_time)
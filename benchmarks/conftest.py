@@ -0,0 +1,125 @@
+from importlib.abc import Traversable
+import json
+import os
+from pathlib import Path
+import platform
+import shutil
+import sys
+
+import pytest
+
+# Benchmarks must be able to run headless.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QStandardPaths  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from functino.language import LanguageProfile  # noqa: E402
+from functino.project_path import get_built_in_language_profiles_path  # noqa: E402
+
+# Trivial programs for each built-in language, used to measure the overhead of running
+# code rather than the cost of the code itself.
+TRIVIAL_PROGRAMS = {
+    "c": "int main(void) { return 0; }\n",
+    "cpp": "int main() { return 0; }\n",
+    "javascript.js": "\n",
+    "python": "pass\n",
+    "ruby": "\n",
+    "rust": "fn main() {}\n",
+}
+
+STUB_INTERPRETER = "import sys\n"
+STUB_COMPILER = """\
+import os
+import shutil
+import sys
+
+shutil.copyfile(sys.argv[1], sys.argv[2])
+os.chmod(sys.argv[2], 0o755)
+"""
+STUB_PROGRAM = "#!/bin/sh\nexit 0\n"
+
+
+@pytest.fixture(scope="session")
+def qapp() -> QApplication:
+    """
+    Return the application instance, using Qt's test mode so that the user's real
+    settings, profiles and caches are left alone.
+    """
+    QStandardPaths.setTestModeEnabled(True)
+    app = QApplication.instance() or QApplication([])
+    app.setOrganizationName("functinodev")
+    app.setApplicationName("functino")
+    return app
+
+
+@pytest.fixture(scope="session")
+def stub_toolchain_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Return a directory with stub interpreter and compiler scripts.
+
+    The stub compiler "compiles" any source into a shell script that exits
+    immediately.
+    """
+    stub_path = tmp_path_factory.mktemp("stub_toolchain")
+    (stub_path / "interpreter.py").write_text(STUB_INTERPRETER)
+    (stub_path / "compiler.py").write_text(STUB_COMPILER)
+    return stub_path
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    """
+    Parametrize benchmarks that use the profile_path fixture over all built-in
+    language profiles.
+    """
+    if "profile_path" in metafunc.fixturenames:
+        profile_paths = sorted(
+            get_built_in_language_profiles_path().iterdir(), key=lambda p: p.name
+        )
+        metafunc.parametrize(
+            "profile_path",
+            profile_paths,
+            ids=[Path(profile_path.name).stem for profile_path in profile_paths],
+        )
+
+
+@pytest.fixture
+def benchmark_profile(
+    profile_path: Traversable, stub_toolchain_path: Path
+) -> tuple[LanguageProfile, str]:
+    """
+    Return a built-in profile and a trivial program for it.
+
+    If the profile's toolchain isn't installed, a profile of the same shape that uses
+    the stub toolchain is returned instead.
+    """
+    profile = LanguageProfile(profile_path)
+    program = TRIVIAL_PROGRAMS.get(profile.language_id, "")
+    if shutil.which(profile.command[0]) is not None:
+        return (profile, program)
+    if profile.compile and platform.system() == "Windows":
+        pytest.skip("stub compiled programs are not supported on Windows")
+    if profile.compile:
+        command = [
+            sys.executable,
+            str(stub_toolchain_path / "compiler.py"),
+            "{source_file_path}",
+            "{executable_path}",
+        ]
+        program = STUB_PROGRAM
+    else:
+        command = [
+            sys.executable,
+            str(stub_toolchain_path / "interpreter.py"),
+            "{source_file_path}",
+        ]
+    stub_profile_path = stub_toolchain_path / profile_path.name
+    stub_profile_path.write_text(
+        f'name = "{profile.name} (stub)"\n'
+        f'language_id = "{profile.language_id}"\n'
+        f'source_file_extension = "{profile.source_file_extension}"\n'
+        f"compile = {json.dumps(profile.compile)}\n"
+        "[command]\n"
+        f"default = {json.dumps(command)}\n"
+    )
+    return (LanguageProfile(stub_profile_path), program)
@@ -0,0 +1,231 @@
+from collections import OrderedDict
+from hashlib import sha256
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import threading
+
+from functino.crates import add_crate_args, prepare_crates
+from functino.file import write_to_tmp_file
+from functino.keyed_lock import KeyedLock
+from functino.language import LanguageProfile
+from functino.platform_path import get_user_cache_path
+from functino.process import run_process
+from functino.schedule import Priority
+from functino.trace import span
+
+
+class BuildResult:
+    """
+    The result of compiling code with a compile profile.
+
+    If compilation failed, executable_path is None and stdout and stderr hold the
+    compiler output.
+    """
+
+    def __init__(
+        self,
+        executable_path: str | None,
+        stdout: str,
+        stderr: str,
+        compile_time: float | None = None,
+    ) -> None:
+        self._executable_path = executable_path
+        self._stdout = stdout
+        self._stderr = stderr
+        self._compile_time = compile_time
+
+    @property
+    def executable_path(self) -> str | None:
+        """
+        The path of the compiled program, or None if compilation failed.
+        """
+        return self._executable_path
+
+    @property
+    def stdout(self) -> str:
+        """
+        The stdout of the compiler.
+        """
+        return self._stdout
+
+    @property
+    def stderr(self) -> str:
+        """
+        The stderr of the compiler.
+        """
+        return self._stderr
+
+    @property
+    def compile_time(self) -> float | None:
+        """
+        The wall time in seconds the compiler took, or None if the result came from the
+        cache.
+        """
+        return self._compile_time
+
+
+_BUILD_CACHE_SIZE = 32
+_failed_builds: OrderedDict[str, BuildResult] = OrderedDict()
+_failed_builds_lock = threading.Lock()
+_build_locks = KeyedLock()
+_compiler_versions: dict[str, str] = {}
+
+
+def build(
+    language_profile: LanguageProfile,
+    code: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> BuildResult:
+    """
+    Compile code with the given compile profile and return the result.
+
+    Compiled programs are cached on disk by the content hash of the code, profile
+    command and compiler version, so building the same code again (from any Functino
+    process) skips the compiler. Failed builds are cached in memory, but only reused by
+    builds below interactive priority, so that a run picks up fixes to the environment
+    (e.g. a header that was missing). Concurrent builds of the same code wait for each
+    other instead of compiling twice.
+
+    The compiler process is scheduled with the given priority (see run_process). If the
+    code declares dependencies, they are built (or taken from their cache) first and
+    passed to the compiler (see prepare_crates).
+    """
+    compiler_version = _get_compiler_version(language_profile, priority)
+    build_key = _get_build_key(language_profile, code, compiler_version)
+    with span("compile") as compile_span, _build_locks.hold(build_key):
+        cached_result = lookup_build(language_profile, code)
+        if (
+            cached_result is not None
+            and cached_result.executable_path is None
+            and priority == Priority.INTERACTIVE
+        ):
+            cached_result = None
+        compile_span.set_arg("cached", cached_result is not None)
+        if cached_result is not None:
+            return cached_result
+        crate_result = prepare_crates(language_profile, code, priority)
+        if crate_result is not None and crate_result.failed:
+            return BuildResult(None, "", crate_result.output)
+        build_cache_path = get_build_cache_path()
+        with span("workspace setup"):
+            os.makedirs(build_cache_path, mode=0o755, exist_ok=True)
+            temp_dir = TemporaryDirectory(dir=build_cache_path)
+        with temp_dir as temp_dir_path:
+            source_file_path = write_to_tmp_file(
+                code, language_profile.source_file_extension, temp_dir_path
+            )
+            temp_executable_path = os.path.join(temp_dir_path, "build.exe")
+            command = add_crate_args(
+                language_profile.generate_command(
+                    source_file_path, temp_executable_path
+                ),
+                crate_result,
+            )
+            returncode, stdout, stderr, _, usage = run_process(
+                command, priority=priority
+            )
+            compile_time = usage.wall_time
+            if crate_result is not None and crate_result.build_time is not None:
+                compile_time += crate_result.build_time
+            with span("decode"):
+                result = BuildResult(
+                    None, stdout.decode(), stderr.decode(), compile_time
+                )
+            if returncode != 0:
+                with _failed_builds_lock:
+                    _failed_builds[build_key] = BuildResult(
+                        None, result.stdout, result.stderr
+                    )
+                    if len(_failed_builds) > _BUILD_CACHE_SIZE:
+                        _failed_builds.popitem(last=False)
+                return result
+            executable_path = str(build_cache_path / f"{build_key}.exe")
+            os.replace(temp_executable_path, executable_path)
+        _prune_build_cache(build_cache_path)
+        return BuildResult(executable_path, result.stdout, result.stderr, compile_time)
+
+
+def lookup_build(language_profile: LanguageProfile, code: str) -> BuildResult | None:
+    """
+    Return the cached build result for the given code, or None if it hasn't been built.
+
+    Returns None until the compiler's version is known, i.e. until the profile's first
+    build in this process.
+    """
+    compiler_version = _compiler_versions.get(language_profile.command[0])
+    if compiler_version is None:
+        return None
+    build_key = _get_build_key(language_profile, code, compiler_version)
+    with _failed_builds_lock:
+        failed_result = _failed_builds.get(build_key)
+    if failed_result is not None:
+        return failed_result
+    executable_path = get_build_cache_path() / f"{build_key}.exe"
+    try:
+        # Mark the program as recently used so that it survives pruning.
+        os.utime(executable_path)
+    except OSError:
+        return None
+    return BuildResult(str(executable_path), "", "")
+
+
+def get_build_cache_path() -> Path:
+    """
+    Get path of the directory that holds compiled programs.
+    """
+    return get_user_cache_path() / "builds"
+
+
+def _get_build_key(
+    language_profile: LanguageProfile, code: str, compiler_version: str
+) -> str:
+    """
+    Return the content hash that identifies a build.
+    """
+    key_data = repr(
+        (language_profile.name, language_profile.command, compiler_version, code)
+    )
+    return sha256(key_data.encode()).hexdigest()
+
+
+def _get_compiler_version(language_profile: LanguageProfile, priority: Priority) -> str:
+    """
+    Return the --version output of the profile's compiler, or an empty string if it
+    can't be determined (e.g. because the compiler is missing).
+
+    The version is only queried once per compiler, so compiler updates are picked up
+    after Functino restarts. Failed queries are retried on the next build.
+    """
+    compiler_program = language_profile.command[0]
+    compiler_version = _compiler_versions.get(compiler_program)
+    if compiler_version is None:
+        try:
+            returncode, stdout, stderr, _, _ = run_process(
+                (compiler_program, "--version"), priority=priority
+            )
+        except OSError:
+            return ""
+        if returncode != 0:
+            return ""
+        compiler_version = (stdout + stderr).decode(errors="replace")
+        _compiler_versions[compiler_program] = compiler_version
+    return compiler_version
+
+
+def _prune_build_cache(build_cache_path: Path) -> None:
+    """
+    Delete the least recently used programs beyond the cache size.
+    """
+    executable_paths = []
+    for executable_path in build_cache_path.glob("*.exe"):
+        try:
+            executable_paths.append((executable_path.stat().st_mtime, executable_path))
+        except OSError:
+            pass
+    executable_paths.sort(reverse=True)
+    for _, executable_path in executable_paths[_BUILD_CACHE_SIZE:]:
+        try:
+            executable_path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,283 @@
+from collections import OrderedDict
+from hashlib import sha256
+import os
+import re
+from tempfile import TemporaryDirectory
+import threading
+
+from functino.crates import add_crate_args, prepare_crates
+from functino.file import write_to_tmp_file
+from functino.language import LanguageProfile
+from functino.process import run_process
+from functino.schedule import Priority
+
+
+class CodegenLine:
+    """
+    A single line of generated code.
+    """
+
+    def __init__(self, text: str, source_line: int | None) -> None:
+        self._text = text
+        self._source_line = source_line
+
+    @property
+    def text(self) -> str:
+        """
+        The text of this line.
+        """
+        return self._text
+
+    @property
+    def source_line(self) -> int | None:
+        """
+        The zero-based line of the source code that this line was generated from, or
+        None if it is unknown.
+        """
+        return self._source_line
+
+
+class CodegenResult:
+    """
+    The generated code for a snippet, filtered down to the snippet's own functions.
+
+    If the code generation command failed, lines will be empty and error will contain
+    the compiler output.
+    """
+
+    def __init__(self, lines: tuple[CodegenLine, ...], error: str = "") -> None:
+        self._lines = lines
+        self._error = error
+
+    @property
+    def lines(self) -> tuple[CodegenLine, ...]:
+        """
+        The generated lines.
+        """
+        return self._lines
+
+    @property
+    def error(self) -> str:
+        """
+        The compiler output if code generation failed, otherwise an empty string.
+        """
+        return self._error
+
+
+_CACHE_SIZE = 64
+_cache: OrderedDict[str, CodegenResult] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_codegen(
+    language_profile: LanguageProfile,
+    view_name: str,
+    code: str,
+    extra_flags: tuple[str, ...] = (),
+) -> CodegenResult:
+    """
+    Generate code for the given view of the language profile and return it.
+
+    Results are cached by profile, view, command, flags and source, so asking for the
+    same code generation twice only runs the compiler once. Dependencies declared by
+    the code are built first (see prepare_crates).
+    """
+    cached_result = lookup_codegen(language_profile, view_name, code, extra_flags)
+    if cached_result is not None:
+        return cached_result
+    crate_result = prepare_crates(language_profile, code, Priority.BATCH)
+    if crate_result is not None and crate_result.failed:
+        return CodegenResult((), crate_result.output)
+    with TemporaryDirectory() as temp_dir_path:
+        source_file_path = write_to_tmp_file(
+            code, language_profile.source_file_extension, temp_dir_path
+        )
+        output_path = os.path.join(temp_dir_path, "codegen.out")
+        command = add_crate_args(
+            language_profile.generate_codegen_command(
+                view_name, source_file_path, output_path, extra_flags
+            ),
+            crate_result,
+        )
+        returncode, stdout, stderr, _, _ = run_process(command, priority=Priority.BATCH)
+        if returncode != 0:
+            result = CodegenResult((), (stderr + stdout).decode())
+        else:
+            with open(output_path, encoding="utf-8", errors="replace") as f:
+                generated_code = f.read()
+            result = CodegenResult(
+                filter_codegen(generated_code, os.path.basename(source_file_path))
+            )
+    cache_key = _get_cache_key(language_profile, view_name, code, extra_flags)
+    with _cache_lock:
+        _cache[cache_key] = result
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def lookup_codegen(
+    language_profile: LanguageProfile,
+    view_name: str,
+    code: str,
+    extra_flags: tuple[str, ...] = (),
+) -> CodegenResult | None:
+    """
+    Return the cached code generation result for the given arguments, or None if there
+    isn't one.
+    """
+    cache_key = _get_cache_key(language_profile, view_name, code, extra_flags)
+    with _cache_lock:
+        result = _cache.get(cache_key)
+        if result is not None:
+            _cache.move_to_end(cache_key)
+    return result
+
+
+def filter_codegen(generated_code: str, source_file_name: str) -> tuple[CodegenLine]:
+    """
+    Filter generated code down to the functions defined in the given source file.
+
+    Assembly and LLVM IR are recognized and filtered using their debug info. Any other
+    output is returned unfiltered and without source line mapping.
+    """
+    if _llvm_define_regex.search(generated_code):
+        return _filter_llvm_ir(generated_code, source_file_name)
+    if _asm_loc_regex.search(generated_code):
+        return _filter_asm(generated_code, source_file_name)
+    return tuple(CodegenLine(line, None) for line in generated_code.splitlines())
+
+
+def _get_cache_key(
+    language_profile: LanguageProfile,
+    view_name: str,
+    code: str,
+    extra_flags: tuple[str, ...],
+) -> str:
+    """
+    Return the cache key for a code generation request.
+    """
+    key_data = repr(
+        (
+            language_profile.name,
+            view_name,
+            language_profile.generate_codegen_command(view_name, "", "", extra_flags),
+            code,
+        )
+    )
+    return sha256(key_data.encode()).hexdigest()
+
+
+_asm_label_regex = re.compile(r"^([A-Za-z_$.][\w$.@]*|\"[^\"]+\"):")
+_asm_file_regex = re.compile(r"^\s*\.file\s+(\d+)\s+.*\"([^\"]*)\"")
+_asm_loc_regex = re.compile(r"^\s*\.loc\s+(\d+)\s+(\d+)", re.MULTILINE)
+_asm_name_regex = re.compile(r"[A-Za-z_$.][\w$.@]*")
+
+
+def _filter_asm(generated_code: str, source_file_name: str) -> tuple[CodegenLine]:
+    """
+    Filter GNU-style assembly down to the functions with line info in the source file.
+
+    Assembler directives and unreferenced local labels are dropped, and .loc
+    directives are used to map instructions back to source lines.
+    """
+    source_file_ids = set()
+    blocks: list[list[CodegenLine]] = [[]]
+    block_is_user_code = [False]
+    source_line = None
+    for line in generated_code.splitlines():
+        file_match = _asm_file_regex.match(line)
+        if file_match is not None:
+            if os.path.basename(file_match.group(2)) == source_file_name:
+                source_file_ids.add(file_match.group(1))
+            continue
+        loc_match = _asm_loc_regex.match(line)
+        if loc_match is not None:
+            source_line = None
+            if loc_match.group(1) in source_file_ids:
+                source_line = _to_source_line(int(loc_match.group(2)))
+                block_is_user_code[-1] = True
+            continue
+        label_match = _asm_label_regex.match(line)
+        if label_match is not None:
+            if not label_match.group(1).startswith(".L"):
+                blocks.append([])
+                block_is_user_code.append(False)
+                source_line = None
+            blocks[-1].append(CodegenLine(line, None))
+            continue
+        stripped_line = line.strip()
+        if not stripped_line or stripped_line.startswith("."):
+            continue
+        blocks[-1].append(CodegenLine(line, source_line))
+    filtered_lines = [
+        line
+        for block, is_user_code in zip(blocks, block_is_user_code)
+        if is_user_code or not source_file_ids
+        for line in block
+    ]
+    referenced_names = set()
+    for line in filtered_lines:
+        if _asm_label_regex.match(line.text) is None:
+            referenced_names.update(_asm_name_regex.findall(line.text))
+    return tuple(
+        line
+        for line in filtered_lines
+        if not line.text.startswith(".L") or line.text[:-1] in referenced_names
+    )
+
+
+_llvm_define_regex = re.compile(r"^define .*@", re.MULTILINE)
+_llvm_dbg_ref_regex = re.compile(r"!dbg (![0-9]+)")
+_llvm_metadata_regex = re.compile(r"^(![0-9]+) = (?:distinct )?!(\w+)\((.*)\)$")
+_llvm_field_regex = re.compile(r"(\w+): (\"[^\"]*\"|[^,]+)")
+
+
+def _filter_llvm_ir(generated_code: str, source_file_name: str) -> tuple[CodegenLine]:
+    """
+    Filter LLVM IR down to the function definitions whose debug info places them in
+    the source file.
+    """
+    lines = generated_code.splitlines()
+    metadata: dict[str, tuple[str, dict[str, str]]] = {}
+    for line in lines:
+        metadata_match = _llvm_metadata_regex.match(line)
+        if metadata_match is not None:
+            fields = dict(_llvm_field_regex.findall(metadata_match.group(3)))
+            metadata[metadata_match.group(1)] = (metadata_match.group(2), fields)
+
+    def is_source_file(file_ref: str | None) -> bool:
+        kind, fields = metadata.get(file_ref or "", ("", {}))
+        filename = fields.get("filename", "").strip('"')
+        return kind == "DIFile" and os.path.basename(filename) == source_file_name
+
+    filtered_lines = []
+    in_user_function = False
+    for line in lines:
+        if line.startswith("define "):
+            dbg_ref_match = _llvm_dbg_ref_regex.search(line)
+            subprogram_ref = dbg_ref_match.group(1) if dbg_ref_match else ""
+            _, subprogram_fields = metadata.get(subprogram_ref, ("", {}))
+            in_user_function = is_source_file(subprogram_fields.get("file"))
+        if not in_user_function:
+            continue
+        source_line = None
+        dbg_ref_match = _llvm_dbg_ref_regex.search(line)
+        if dbg_ref_match is not None and not line.startswith("define "):
+            kind, fields = metadata.get(dbg_ref_match.group(1), ("", {}))
+            if kind == "DILocation" and "inlinedAt" not in fields:
+                source_line = _to_source_line(int(fields["line"]))
+        filtered_lines.append(CodegenLine(line, source_line))
+        if line == "}":
+            in_user_function = False
+            filtered_lines.append(CodegenLine("", None))
+    return tuple(filtered_lines)
+
+
+def _to_source_line(debug_info_line: int) -> int | None:
+    """
+    Convert a one-based debug info line to a zero-based source line.
+
+    Debug info uses line 0 for code that doesn't correspond to any source line.
+    """
+    return debug_info_line - 1 if debug_info_line > 0 else None
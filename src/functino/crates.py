@@ -0,0 +1,450 @@
+from hashlib import sha256
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+from tempfile import TemporaryDirectory
+import tomllib
+from typing import Any, Sequence
+
+from functino.keyed_lock import KeyedLock
+from functino.language import LanguageProfile
+from functino.platform_path import get_user_cache_path
+from functino.process import run_process
+from functino.schedule import Priority
+from functino.trace import span
+
+
+class CrateBuildResult:
+    """
+    The result of building the dependencies declared by a snippet.
+
+    If the build failed, rustc_args is None and output holds the error.
+    """
+
+    def __init__(
+        self,
+        rustc_args: tuple[str, ...] | None,
+        edition: str,
+        output: str = "",
+        build_time: float | None = None,
+    ) -> None:
+        self._rustc_args = rustc_args
+        self._edition = edition
+        self._output = output
+        self._build_time = build_time
+
+    @property
+    def rustc_args(self) -> tuple[str, ...] | None:
+        """
+        The -L and --extern arguments that make the dependencies available to rustc, or
+        None if the build failed.
+        """
+        return self._rustc_args
+
+    @property
+    def edition(self) -> str:
+        """
+        The edition that code using the dependencies must be compiled with.
+        """
+        return self._edition
+
+    @property
+    def output(self) -> str:
+        """
+        The error output if the build failed, otherwise an empty string.
+        """
+        return self._output
+
+    @property
+    def build_time(self) -> float | None:
+        """
+        The wall time in seconds that cargo took, or None if the dependencies came from
+        the cache.
+        """
+        return self._build_time
+
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the dependencies failed to build.
+        """
+        return self._rustc_args is None
+
+
+_CRATE_CACHE_SIZE = 8
+_crate_locks = KeyedLock()
+_toolchain_ids: dict[str, str] = {}
+
+# Matches the inner doc comment at the top of a snippet, which may follow blank lines
+# and plain comments. The embedded manifest is a "cargo" code block in this comment, as
+# in rust-script.
+_manifest_regex = re.compile(
+    r"\A(?:[ \t]*(?://(?!!).*)?\n)*(?P<doc>(?:[ \t]*//!.*\n?)+)"
+)
+_manifest_block_regex = re.compile(
+    r"^```\s*cargo\s*$\n(?P<manifest>.*?)^```\s*$", re.MULTILINE | re.DOTALL
+)
+
+
+def prepare_crates(
+    language_profile: LanguageProfile,
+    code: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> CrateBuildResult | None:
+    """
+    Build the dependencies declared by the code, unless they are cached, and return
+    the rustc arguments to compile the code with.
+
+    Returns None if the profile doesn't support dependencies or the code declares none.
+    Dependencies are declared in a manifest at the top of the code, e.g.:
+
+        //! ```cargo
+        //! [dependencies]
+        //! regex = "1"
+        //! ```
+
+    They are resolved by cargo without network access, from the local registry cache or
+    the profile's vendored crate sources, and built in release mode. The built crates
+    are cached on disk by the dependencies, profile edition, vendor directory and rustc
+    version, so code with the same dependencies (from any Functino process) reuses
+    them. The cargo processes are scheduled with the given priority.
+    """
+    if language_profile.crates_builtin is None:
+        return None
+    try:
+        dependencies = parse_dependencies(code)
+    except ValueError as e:
+        return CrateBuildResult(
+            None, language_profile.crates_edition, f"invalid dependency manifest: {e}\n"
+        )
+    if not dependencies:
+        return None
+    if language_profile.crates_builtin != "cargo":
+        raise RuntimeError(
+            f"unknown built-in dependency builder '{language_profile.crates_builtin}'"
+        )
+    rustc_program = language_profile.command[0]
+    toolchain_id = _get_toolchain_id(rustc_program, priority)
+    if toolchain_id is None:
+        return CrateBuildResult(
+            None,
+            language_profile.crates_edition,
+            f"could not determine the version of '{rustc_program}'\n",
+        )
+    crate_key = _get_crate_key(language_profile, dependencies, toolchain_id)
+    with span("crates") as crates_span, _crate_locks.hold(crate_key):
+        crates_path = get_crate_cache_path() / crate_key
+        cached_result = _read_crates(language_profile, crates_path)
+        crates_span.set_arg("cached", cached_result is not None)
+        if cached_result is not None:
+            return cached_result
+        try:
+            return _build_crates(
+                language_profile, dependencies, crates_path, rustc_program, priority
+            )
+        except OSError as e:
+            return CrateBuildResult(
+                None,
+                language_profile.crates_edition,
+                f"failed to build dependencies: {e}\n",
+            )
+
+
+def parse_dependencies(code: str) -> dict[str, Any]:
+    """
+    Return the dependencies table of the manifest embedded in the code, or an empty
+    dict if there is none.
+
+    Raises ValueError if the manifest isn't valid.
+    """
+    match = _manifest_regex.match(code)
+    if match is None:
+        return {}
+    doc = "\n".join(
+        re.sub(r"^[ \t]*//! ?", "", line) for line in match["doc"].splitlines()
+    )
+    block_match = _manifest_block_regex.search(doc + "\n")
+    if block_match is None:
+        return {}
+    try:
+        manifest = tomllib.loads(block_match["manifest"])
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(str(e)) from e
+    dependencies = manifest.get("dependencies", {})
+    if not isinstance(dependencies, dict):
+        raise ValueError("dependencies must be a table")
+    for name, spec in dependencies.items():
+        if not isinstance(spec, (str, dict)):
+            raise ValueError(f"dependency '{name}' must be a version string or a table")
+        # Values that can't be written back to the build's manifest (e.g. dates).
+        _format_toml_value(spec)
+    return dependencies
+
+
+def add_crate_args(
+    command: Sequence[str], crate_result: CrateBuildResult | None
+) -> tuple[str, ...]:
+    """
+    Append the arguments that make the built dependencies available to a rustc
+    command.
+
+    The edition is only added if the command doesn't already set one.
+    """
+    if crate_result is None or crate_result.rustc_args is None:
+        return tuple(command)
+    edition_args: tuple[str, ...] = (f"--edition={crate_result.edition}",)
+    if any(arg.startswith("--edition") for arg in command):
+        edition_args = ()
+    return (*command, *edition_args, *crate_result.rustc_args)
+
+
+def get_crate_cache_path() -> Path:
+    """
+    Get path of the directory that holds built dependencies.
+    """
+    return get_user_cache_path() / "crates"
+
+
+def _build_crates(
+    language_profile: LanguageProfile,
+    dependencies: dict[str, Any],
+    crates_path: Path,
+    rustc_program: str,
+    priority: Priority,
+) -> CrateBuildResult:
+    """
+    Build the dependencies with cargo and move them into the given cache directory.
+    """
+    edition = language_profile.crates_edition
+    crate_cache_path = get_crate_cache_path()
+    os.makedirs(crate_cache_path, mode=0o755, exist_ok=True)
+    with TemporaryDirectory(dir=crate_cache_path) as temp_dir_path:
+        manifest_path = os.path.join(temp_dir_path, "Cargo.toml")
+        target_path = os.path.join(temp_dir_path, "target")
+        _write_workspace(temp_dir_path, dependencies, edition)
+        cargo_args = (
+            "--offline",
+            "--manifest-path",
+            manifest_path,
+            "--config",
+            f"build.rustc={json.dumps(shutil.which(rustc_program) or rustc_program)}",
+        )
+        vendor_path = language_profile.crates_vendor_path
+        if vendor_path is not None:
+            cargo_args += (
+                "--config",
+                'source.crates-io.replace-with="functino-vendor"',
+                "--config",
+                f"source.functino-vendor.directory={json.dumps(vendor_path)}",
+            )
+        returncode, stdout, stderr, _, metadata_usage = run_process(
+            ("cargo", "metadata", "--format-version", "1", *cargo_args),
+            priority=priority,
+        )
+        if returncode != 0:
+            return CrateBuildResult(None, edition, stderr.decode(errors="replace"))
+        try:
+            extern_names = _read_extern_names(stdout)
+        except (ValueError, KeyError, TypeError, StopIteration) as e:
+            return CrateBuildResult(
+                None, edition, f"unexpected output from cargo metadata: {e!r}\n"
+            )
+        returncode, stdout, stderr, _, build_usage = run_process(
+            (
+                "cargo",
+                "build",
+                "--release",
+                "--message-format=json-render-diagnostics",
+                "--target-dir",
+                target_path,
+                *cargo_args,
+            ),
+            priority=priority,
+        )
+        if returncode != 0:
+            return CrateBuildResult(None, edition, stderr.decode(errors="replace"))
+        try:
+            externs = _read_externs(stdout, extern_names)
+        except (ValueError, KeyError, TypeError) as e:
+            return CrateBuildResult(
+                None, edition, f"unexpected output from cargo build: {e!r}\n"
+            )
+        result_path = os.path.join(temp_dir_path, "result")
+        os.makedirs(result_path)
+        os.replace(
+            os.path.join(target_path, "release", "deps"),
+            os.path.join(result_path, "deps"),
+        )
+        with open(os.path.join(result_path, "externs.json"), "w") as f:
+            json.dump(externs, f)
+        try:
+            os.replace(result_path, crates_path)
+        except OSError:
+            # Another Functino process built the same dependencies first.
+            pass
+    _prune_crate_cache(crate_cache_path)
+    result = _read_crates(language_profile, crates_path)
+    if result is None:
+        return CrateBuildResult(None, edition, "built dependencies went missing\n")
+    return CrateBuildResult(
+        result.rustc_args,
+        edition,
+        build_time=metadata_usage.wall_time + build_usage.wall_time,
+    )
+
+
+def _read_extern_names(metadata_output: bytes) -> dict[str, str]:
+    """
+    Map the package IDs of the direct dependencies to the names the code uses for them,
+    from the output of cargo metadata.
+    """
+    metadata = json.loads(metadata_output)
+    root_node = next(
+        node
+        for node in metadata["resolve"]["nodes"]
+        if node["id"] == metadata["resolve"]["root"]
+    )
+    return {dep["pkg"]: dep["name"] for dep in root_node["deps"]}
+
+
+def _read_externs(build_output: bytes, extern_names: dict[str, str]) -> dict[str, str]:
+    """
+    Map the names of the direct dependencies to the file names of their built crates,
+    from the JSON messages of cargo build.
+    """
+    externs = {}
+    for message_line in build_output.decode(errors="replace").splitlines():
+        message = json.loads(message_line)
+        if (
+            message.get("reason") != "compiler-artifact"
+            or message["package_id"] not in extern_names
+        ):
+            continue
+        # Proc macro crates are dynamic libraries, all others are rlibs.
+        for file_path in message["filenames"]:
+            if file_path.endswith((".rlib", ".so", ".dylib", ".dll")):
+                extern_name = extern_names[message["package_id"]]
+                externs[extern_name] = os.path.basename(file_path)
+                break
+    return externs
+
+
+def _write_workspace(
+    workspace_path: str, dependencies: dict[str, Any], edition: str
+) -> None:
+    """
+    Write a cargo package that depends on the given dependencies.
+    """
+    manifest_lines = [
+        "[package]",
+        'name = "functino-crates"',
+        'version = "0.0.0"',
+        f"edition = {json.dumps(edition)}",
+        "",
+        "[dependencies]",
+    ]
+    for name, spec in dependencies.items():
+        manifest_lines.append(f"{json.dumps(name)} = {_format_toml_value(spec)}")
+    with open(os.path.join(workspace_path, "Cargo.toml"), "w") as f:
+        f.write("\n".join(manifest_lines) + "\n")
+    os.makedirs(os.path.join(workspace_path, "src"))
+    with open(os.path.join(workspace_path, "src", "lib.rs"), "w"):
+        pass
+
+
+def _format_toml_value(value: Any) -> str:
+    """
+    Format a value parsed from TOML as an inline TOML value.
+    """
+    if isinstance(value, dict):
+        items = ", ".join(
+            f"{json.dumps(key)} = {_format_toml_value(item)}"
+            for key, item in value.items()
+        )
+        return f"{{ {items} }}"
+    if isinstance(value, list):
+        return f"[{', '.join(_format_toml_value(item) for item in value)}]"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, str)):
+        return json.dumps(value)
+    raise ValueError(f"unsupported manifest value {value!r}")
+
+
+def _read_crates(
+    language_profile: LanguageProfile, crates_path: Path
+) -> CrateBuildResult | None:
+    """
+    Return the rustc arguments of cached dependencies, or None if they aren't cached.
+    """
+    deps_path = crates_path / "deps"
+    try:
+        with open(crates_path / "externs.json") as f:
+            externs: dict[str, str] = json.load(f)
+        # Mark the dependencies as recently used so that they survive pruning.
+        os.utime(crates_path)
+    except (OSError, ValueError):
+        return None
+    rustc_args = ["-L", f"dependency={deps_path}"]
+    for name, file_name in externs.items():
+        rustc_args += ["--extern", f"{name}={deps_path / file_name}"]
+    return CrateBuildResult(tuple(rustc_args), language_profile.crates_edition)
+
+
+def _get_toolchain_id(rustc_program: str, priority: Priority) -> str | None:
+    """
+    Return the verbose version of the given rustc, which identifies its toolchain.
+
+    The version is only queried once per program, so toolchain updates are picked up
+    after Functino restarts.
+    """
+    toolchain_id = _toolchain_ids.get(rustc_program)
+    if toolchain_id is None:
+        try:
+            returncode, stdout, _, _, _ = run_process(
+                (rustc_program, "-vV"), priority=priority
+            )
+        except OSError:
+            return None
+        if returncode != 0:
+            return None
+        toolchain_id = stdout.decode(errors="replace")
+        _toolchain_ids[rustc_program] = toolchain_id
+    return toolchain_id
+
+
+def _get_crate_key(
+    language_profile: LanguageProfile, dependencies: dict[str, Any], toolchain_id: str
+) -> str:
+    """
+    Return the content hash that identifies a set of built dependencies.
+    """
+    key_data = repr(
+        (
+            json.dumps(dependencies, sort_keys=True),
+            language_profile.crates_edition,
+            language_profile.crates_vendor_path,
+            toolchain_id,
+        )
+    )
+    return sha256(key_data.encode()).hexdigest()
+
+
+def _prune_crate_cache(crate_cache_path: Path) -> None:
+    """
+    Delete the least recently used dependency sets beyond the cache size.
+    """
+    crates_paths = []
+    for crates_path in crate_cache_path.iterdir():
+        if not (crates_path / "externs.json").exists():
+            # A build in progress.
+            continue
+        try:
+            crates_paths.append((crates_path.stat().st_mtime, crates_path))
+        except OSError:
+            pass
+    crates_paths.sort(reverse=True)
+    for _, crates_path in crates_paths[_CRATE_CACHE_SIZE:]:
+        shutil.rmtree(crates_path, ignore_errors=True)
@@ -0,0 +1,403 @@
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import getpass
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import (
+    Client,
+    Connection,
+    Listener,
+    answer_challenge,
+    deliver_challenge,
+)
+import os
+from pathlib import Path
+import platform
+import secrets
+import socket
+import sys
+import threading
+from typing import Any, Callable
+
+from PyQt6.QtCore import QCoreApplication
+
+from functino.codegen import CodegenResult, get_codegen
+from functino.execute import RunResult, get_output
+from functino.language import LanguageProfile, get_language_profiles
+from functino.platform_path import get_user_config_path, get_user_runtime_path
+from functino.sample import ResourceSample
+from functino.schedule import get_scheduler
+from functino.trace import add_trace_events, is_tracing_enabled, record_spans, span
+
+
+class DaemonError(Exception):
+    """
+    Raised when the execution daemon reports that a job failed, or when the connection
+    to it is lost while a job is in progress.
+    """
+
+
+class ExecutionDaemon:
+    """
+    Long-lived local service that runs jobs on behalf of Functino windows and scripts.
+
+    Clients connect over a Unix domain socket (or a named pipe on Windows), send a
+    single job request, and receive a stream of progress messages followed by the job
+    result. Jobs run on a shared worker pool, so the in-memory caches (e.g. generated
+    code) are shared by all clients.
+
+    Every message is a (kind, payload) tuple where kind is one of "progress", "trace",
+    "result" or "error". If the request asks for tracing, the spans recorded while
+    running the job are sent in a trace message before the result.
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._language_profiles: dict[str, LanguageProfile] = {}
+        self._language_profiles_lock = threading.Lock()
+        self._stopping = False
+
+    def serve(self) -> None:
+        """
+        Accept and handle client connections until a shutdown job is received.
+        """
+        address = get_daemon_address()
+        if platform.system() != "Windows":
+            os.makedirs(os.path.dirname(address), mode=0o700, exist_ok=True)
+            if os.path.exists(address):
+                os.remove(address)
+        authkey = secrets.token_bytes(32)
+        # Clients are authenticated by _handle_connection on the worker pool, so that a
+        # client that never answers the challenge can't block the accept loop.
+        with Listener(address) as listener:
+            _write_authkey(authkey)
+            while not self._stopping:
+                try:
+                    connection = listener.accept()
+                except OSError:
+                    continue
+                self._pool.submit(self._handle_connection, connection, authkey)
+        self._pool.shutdown()
+
+    def _handle_connection(self, connection: Connection, authkey: bytes) -> None:
+        """
+        Authenticate a client and handle its job request.
+        """
+        if not _authenticate(connection, authkey):
+            connection.close()
+            return
+        send_lock = threading.Lock()
+
+        def send(kind: str, payload: Any) -> None:
+            with send_lock:
+                connection.send((kind, payload))
+
+        def send_progress(progress: Any) -> None:
+            send("progress", progress)
+
+        with connection:
+            try:
+                request: dict[str, Any] = connection.recv()
+                if request.get("trace"):
+                    with record_spans() as trace_events:
+                        result = self._run_job(request, send_progress)
+                    send("trace", trace_events)
+                else:
+                    result = self._run_job(request, send_progress)
+                send("result", result)
+            except (EOFError, OSError):
+                pass
+            except Exception as e:
+                try:
+                    send("error", str(e))
+                except OSError:
+                    pass
+
+    def _run_job(
+        self, request: dict[str, Any], on_progress: Callable[[Any], None]
+    ) -> Any:
+        """
+        Run the requested job and return its result.
+        """
+        match request["type"]:
+            case "run":
+                return get_output(
+                    self._get_language_profile(request["profile"]),
+                    request["code"],
+                    request.get("sample_interval"),
+                    on_progress,
+                    request.get("profile_lines", False),
+                )
+            case "codegen":
+                return get_codegen(
+                    self._get_language_profile(request["profile"]),
+                    request["view"],
+                    request["code"],
+                    tuple(request.get("extra_flags", ())),
+                )
+            case "stats":
+                return tuple(map(str, get_scheduler().stats()))
+            case "shutdown":
+                self._stopping = True
+                # Wake up the listener so that it notices the shutdown.
+                wake_up_connection = _connect()
+                if wake_up_connection is not None:
+                    wake_up_connection.close()
+                return None
+            case _:
+                raise ValueError(f"unknown job type {request['type']}")
+
+    def _get_language_profile(self, name: str) -> LanguageProfile:
+        """
+        Return the language profile with the given name.
+
+        Profiles are loaded once and reloaded only when an unknown name is requested,
+        which picks up profiles that were added while the daemon was running.
+        """
+        with span("profile lookup"), self._language_profiles_lock:
+            if name not in self._language_profiles:
+                self._language_profiles = {
+                    profile.name: profile for profile in get_language_profiles()
+                }
+            if name not in self._language_profiles:
+                raise RuntimeError(f"no language profile named '{name}'")
+            return self._language_profiles[name]
+
+
+# Seconds that a client has to complete the authentication handshake.
+_HANDSHAKE_TIMEOUT = 5.0
+
+
+def get_daemon_address() -> str:
+    """
+    Get the address that the execution daemon listens on.
+    """
+    if platform.system() == "Windows":
+        return rf"\\.\pipe\functino-daemon-{getpass.getuser()}"
+    return str(get_user_runtime_path() / "daemon.sock")
+
+
+def submit_job(
+    request: dict[str, Any], on_progress: Callable[[Any], None] | None = None
+) -> Any:
+    """
+    Submit a job to the execution daemon and return its result.
+
+    Progress messages are passed to on_progress as they arrive. Raises ConnectionError
+    if the daemon isn't running and DaemonError if the job failed. Once the job is
+    submitted, a lost connection also raises DaemonError, since the job may already
+    have run.
+
+    If tracing is enabled, the daemon is asked to trace the job and its spans are added
+    to the trace of this process.
+    """
+    connection = _connect()
+    if connection is None:
+        raise ConnectionError("execution daemon is not running")
+    with connection, span("daemon request", type=request["type"]):
+        try:
+            connection.send({**request, "trace": is_tracing_enabled()})
+            while True:
+                kind, payload = connection.recv()
+                match kind:
+                    case "progress":
+                        if on_progress is not None:
+                            on_progress(payload)
+                    case "trace":
+                        add_trace_events(payload)
+                    case "result":
+                        return payload
+                    case _:
+                        raise DaemonError(payload)
+        except (EOFError, OSError) as e:
+            raise DaemonError("daemon connection lost") from e
+
+
+def is_daemon_running() -> bool:
+    """
+    Return whether the execution daemon is accepting connections.
+    """
+    connection = _connect()
+    if connection is None:
+        return False
+    connection.close()
+    return True
+
+
+def get_output_via_daemon(
+    language_profile: LanguageProfile,
+    code: str,
+    sample_interval: float | None = None,
+    on_sample: Callable[[ResourceSample], None] | None = None,
+    profile_lines: bool = False,
+) -> RunResult | None:
+    """
+    Equivalent of get_output that runs the code on the execution daemon.
+
+    Returns None if the daemon isn't running.
+    """
+    try:
+        return submit_job(
+            {
+                "type": "run",
+                "profile": language_profile.name,
+                "code": code,
+                "sample_interval": sample_interval,
+                "profile_lines": profile_lines,
+            },
+            on_sample,
+        )
+    except ConnectionError:
+        return None
+
+
+def get_codegen_via_daemon(
+    language_profile: LanguageProfile,
+    view_name: str,
+    code: str,
+    extra_flags: tuple[str, ...] = (),
+) -> CodegenResult | None:
+    """
+    Equivalent of get_codegen that generates the code on the execution daemon.
+
+    Returns None if the daemon isn't running.
+    """
+    try:
+        return submit_job(
+            {
+                "type": "codegen",
+                "profile": language_profile.name,
+                "view": view_name,
+                "code": code,
+                "extra_flags": extra_flags,
+            }
+        )
+    except ConnectionError:
+        return None
+
+
+def main() -> None:
+    """
+    Command line entry point for running and talking to the execution daemon.
+    """
+    QCoreApplication.setOrganizationName("functinodev")
+    QCoreApplication.setApplicationName("functino")
+    parser = ArgumentParser(description="Functino execution daemon")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run the daemon")
+    serve_parser.add_argument("--workers", type=int, help="size of the worker pool")
+    serve_parser.add_argument(
+        "--max-processes",
+        type=int,
+        help="maximum number of processes to run at once (default: CPU core count)",
+    )
+    subparsers.add_parser("stop", help="stop the running daemon")
+    subparsers.add_parser("status", help="check whether the daemon is running")
+    subparsers.add_parser("stats", help="show the daemon's process queue statistics")
+    run_parser = subparsers.add_parser("run", help="run a source file on the daemon")
+    run_parser.add_argument("profile", help="name of the language profile to use")
+    run_parser.add_argument("source_file", help="source file to run ('-' for stdin)")
+    args = parser.parse_args()
+    match args.command:
+        case "serve":
+            if is_daemon_running():
+                sys.exit("execution daemon is already running")
+            get_scheduler().max_concurrency = args.max_processes
+            ExecutionDaemon(args.workers).serve()
+        case "stop":
+            try:
+                submit_job({"type": "shutdown"})
+            except ConnectionError as e:
+                sys.exit(str(e))
+        case "status":
+            running = is_daemon_running()
+            print("running" if running else "not running")
+            sys.exit(0 if running else 1)
+        case "stats":
+            try:
+                print("\n".join(submit_job({"type": "stats"})))
+            except (ConnectionError, DaemonError) as e:
+                sys.exit(str(e))
+        case "run":
+            if args.source_file == "-":
+                code = sys.stdin.read()
+            else:
+                code = Path(args.source_file).read_text()
+            try:
+                result: RunResult = submit_job(
+                    {"type": "run", "profile": args.profile, "code": code}
+                )
+            except (ConnectionError, DaemonError) as e:
+                sys.exit(str(e))
+            sys.stdout.write(result.stdout)
+            sys.stderr.write(result.stderr)
+
+
+def _connect() -> Connection | None:
+    """
+    Connect to the execution daemon, returning None if it isn't running.
+    """
+    try:
+        authkey = _get_authkey_path().read_bytes()
+        return Client(get_daemon_address(), authkey=authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+
+def _authenticate(connection: Connection, authkey: bytes) -> bool:
+    """
+    Run the handshake that Listener.accept runs when it has an authentication key, and
+    return whether the client passed it.
+
+    The connection is shut down if the client doesn't finish the handshake within
+    _HANDSHAKE_TIMEOUT seconds.
+    """
+    watchdog = threading.Timer(_HANDSHAKE_TIMEOUT, _abort_connection, (connection,))
+    watchdog.start()
+    try:
+        deliver_challenge(connection, authkey)
+        answer_challenge(connection, authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return False
+    finally:
+        watchdog.cancel()
+    return True
+
+
+def _abort_connection(connection: Connection) -> None:
+    """
+    Make any read that is blocked on the connection fail.
+    """
+    try:
+        if platform.system() == "Windows":
+            connection.close()
+        else:
+            # Shutting the socket down wakes up a blocked read, unlike closing it.
+            with socket.socket(fileno=os.dup(connection.fileno())) as client_socket:
+                client_socket.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _get_authkey_path() -> Path:
+    """
+    Get the path of the file holding the key that clients authenticate with.
+    """
+    return get_user_config_path() / "daemon.key"
+
+
+def _write_authkey(authkey: bytes) -> None:
+    """
+    Write the authentication key so that only the current user can read it.
+    """
+    authkey_path = _get_authkey_path()
+    os.makedirs(authkey_path.parent, mode=0o755, exist_ok=True)
+    fd = os.open(authkey_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, "fchmod"):
+        # The mode passed to os.open only applies if it creates the file.
+        os.fchmod(fd, 0o600)
+    with open(fd, "wb") as f:
+        f.write(authkey)
+
+
+if __name__ == "__main__":
+    main()
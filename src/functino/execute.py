@@ -1,45 +1,253 @@
+from contextlib import ExitStack
+from importlib.abc import Traversable
+from importlib.resources import as_file
+import json
 import os
-import platform
-import subprocess
-from tempfile import TemporaryDirectory, mkstemp
-from typing import cast
+from tempfile import TemporaryDirectory
+from typing import Callable, Mapping
 
+from functino.build import build
 from functino.file import write_to_tmp_file
 from functino.language import LanguageProfile
+from functino.process import ProcessUsage, run_process
+from functino.project_path import get_scripts_path
+from functino.sample import ResourceSample
+from functino.trace import span
 
 
-def get_output(language_profile: LanguageProfile, code: str) -> tuple[str, str]:
+class LineStats:
     """
-    Write code to file, execute it, and return the stdout and stderr.
+    How often a line of code was executed and how long it took.
+    """
+
+    def __init__(self, hits: int, time: float) -> None:
+        self._hits = hits
+        self._time = time
+
+    @property
+    def hits(self) -> int:
+        """
+        The number of times the line was executed.
+        """
+        return self._hits
+
+    @property
+    def time(self) -> float:
+        """
+        The total time in seconds spent executing the line, including the time of
+        everything it called.
+        """
+        return self._time
+
+
+class RunTimings:
+    """
+    How long a run took and how much CPU time and memory it used.
+    """
+
+    def __init__(
+        self,
+        compile_time: float | None,
+        run_time: float,
+        cpu_time: float | None,
+        peak_rss_bytes: int | None,
+    ) -> None:
+        self._compile_time = compile_time
+        self._run_time = run_time
+        self._cpu_time = cpu_time
+        self._peak_rss_bytes = peak_rss_bytes
+
+    @property
+    def compile_time(self) -> float | None:
+        """
+        The wall time in seconds of the compilation, or None if the profile doesn't
+        compile or the program came from the build cache.
+        """
+        return self._compile_time
+
+    @property
+    def run_time(self) -> float:
+        """
+        The wall time in seconds of the executed code.
+        """
+        return self._run_time
+
+    @property
+    def cpu_time(self) -> float | None:
+        """
+        The user and system CPU seconds of the executed code, or None if the platform
+        doesn't report it.
+        """
+        return self._cpu_time
+
+    @property
+    def peak_rss_bytes(self) -> int | None:
+        """
+        The peak resident set size of the executed code, or None if the platform
+        doesn't report it.
+        """
+        return self._peak_rss_bytes
+
+
+class RunResult:
+    """
+    The results of executing code with a language profile.
+    """
+
+    def __init__(
+        self,
+        stdout: str,
+        stderr: str,
+        samples: tuple[ResourceSample, ...] = (),
+        line_stats: Mapping[int, LineStats] | None = None,
+        timings: RunTimings | None = None,
+    ) -> None:
+        self._stdout = stdout
+        self._stderr = stderr
+        self._samples = samples
+        self._line_stats = line_stats or {}
+        self._timings = timings
+
+    @property
+    def stdout(self) -> str:
+        """
+        The stdout of the run (or of the compilation if it failed).
+        """
+        return self._stdout
+
+    @property
+    def stderr(self) -> str:
+        """
+        The stderr of the run (or of the compilation if it failed).
+        """
+        return self._stderr
+
+    @property
+    def samples(self) -> tuple[ResourceSample, ...]:
+        """
+        The CPU and memory timeline of the executed code.
+
+        This is empty if sampling was not requested or is not supported on this
+        platform.
+        """
+        return self._samples
+
+    @property
+    def line_stats(self) -> Mapping[int, LineStats]:
+        """
+        The execution statistics of each executed zero-based source line.
+
+        This is empty if line profiling was not requested or is not supported by the
+        language profile.
+        """
+        return self._line_stats
+
+    @property
+    def timings(self) -> RunTimings | None:
+        """
+        How long the run took, or None if the code didn't run (e.g. because compilation
+        failed).
+
+        Timings of line profiled runs include the profiler's overhead.
+        """
+        return self._timings
+
+
+def get_output(
+    language_profile: LanguageProfile,
+    code: str,
+    sample_interval: float | None = None,
+    on_sample: Callable[[ResourceSample], None] | None = None,
+    profile_lines: bool = False,
+) -> RunResult:
+    """
+    Write code to file, execute it, and return the results.
 
     If the given language profile requires compilation and if the compilation fails, the
     results of the compilation will be returned.
+
+    If sample_interval is given, the CPU and memory usage of the executed code's process
+    tree will be sampled every sample_interval seconds. Each sample is passed to
+    on_sample as it is taken (from a background thread), and the full timeline is
+    included in the returned result. Compilation is not sampled.
+
+    If profile_lines is true and the language profile supports it, the code is run with
+    a line profiler and the returned result includes per-line statistics. Line
+    profiling slows the code down considerably.
     """
-    with TemporaryDirectory() as temp_dir_path:
+    if language_profile.compile:
+        build_result = build(language_profile, code)
+        if build_result.executable_path is None:
+            return RunResult(build_result.stdout, build_result.stderr)
+        _, stdout, stderr, samples, usage = run_process(
+            (build_result.executable_path,), sample_interval, on_sample
+        )
+        timings = _get_timings(usage, build_result.compile_time)
+        with span("decode"):
+            return RunResult(stdout.decode(), stderr.decode(), samples, None, timings)
+    with span("workspace setup"):
+        temp_dir = TemporaryDirectory()
+    with temp_dir as temp_dir_path, ExitStack() as exit_stack:
         source_file_path = write_to_tmp_file(
             code, language_profile.source_file_extension, temp_dir_path
         )
-        executable_file_path: str | None = None
-        if language_profile.compile:
-            fd, executable_file_path = mkstemp(dir=temp_dir_path, suffix=".exe")
-            os.close(fd)
-        command = language_profile.generate_command(
-            source_file_path, executable_file_path
-        )
-        creationflags = 0
-        if platform.system() == "Windows":
-            creationflags = subprocess.CREATE_NO_WINDOW  # type: ignore
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            shell=False,
-            creationflags=creationflags,
+        line_stats_path = None
+        if profile_lines and language_profile.line_profile_builtin is not None:
+            line_profiler_path = exit_stack.enter_context(
+                as_file(_get_line_profiler_path(language_profile))
+            )
+            line_stats_path = os.path.join(temp_dir_path, "line_stats.json")
+            command = language_profile.generate_helper_command(
+                str(line_profiler_path), (source_file_path, line_stats_path)
+            )
+        else:
+            command = language_profile.generate_command(source_file_path)
+        _, stdout, stderr, samples, usage = run_process(
+            command, sample_interval, on_sample
         )
-        if language_profile.compile and result.returncode == 0:
-            result = subprocess.run(
-                (cast(str, executable_file_path),),
-                capture_output=True,
-                shell=False,
-                creationflags=creationflags,
+        line_stats = _read_line_stats(line_stats_path) if line_stats_path else {}
+        with span("decode"):
+            return RunResult(
+                stdout.decode(),
+                stderr.decode(),
+                samples,
+                line_stats,
+                _get_timings(usage),
             )
-        return (result.stdout.decode(), result.stderr.decode())
+
+
+def _get_timings(usage: ProcessUsage, compile_time: float | None = None) -> RunTimings:
+    """
+    Make run timings from the resource usage of the executed code's process.
+    """
+    return RunTimings(
+        compile_time, usage.wall_time, usage.cpu_time, usage.peak_rss_bytes
+    )
+
+
+def _get_line_profiler_path(language_profile: LanguageProfile) -> Traversable:
+    """
+    Return the path of the script that profiles the lines of a run.
+    """
+    match language_profile.line_profile_builtin:
+        case "python":
+            return get_scripts_path() / "line_tracer.py"
+        case builtin:
+            raise RuntimeError(f"unknown built-in line profiler '{builtin}'")
+
+
+def _read_line_stats(line_stats_path: str) -> dict[int, LineStats]:
+    """
+    Read the line statistics written by a line profiler script.
+
+    Returns an empty dict if the script didn't write any, e.g. because it was killed.
+    """
+    try:
+        with open(line_stats_path) as f:
+            line_stats_data: dict[str, list] = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        int(line) - 1: LineStats(hits, time)
+        for line, (hits, time) in line_stats_data.items()
+    }
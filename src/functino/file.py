@@ -1,5 +1,7 @@
 from tempfile import mkstemp
 
+from functino.trace import span
+
 
 def write_to_tmp_file(
     contents: str, file_extension: str, directory: str | None = None
@@ -8,8 +10,9 @@ def write_to_tmp_file(
     Write given contents to temporary file (optionally in the given directory) and
     return file path.
     """
-    suffix = "." + file_extension if file_extension else None
-    fd, path = mkstemp(dir=directory, suffix=suffix)
-    with open(fd, "w", newline="") as tmp_file:
-        tmp_file.write(contents)
-    return path
+    with span("source write"):
+        suffix = "." + file_extension if file_extension else None
+        fd, path = mkstemp(dir=directory, suffix=suffix)
+        with open(fd, "w", newline="") as tmp_file:
+            tmp_file.write(contents)
+        return path
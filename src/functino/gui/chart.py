@@ -0,0 +1,134 @@
+from PyQt6.QtCore import QPointF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPaintEvent, QPalette, QPen, QPolygonF
+from PyQt6.QtWidgets import QSizePolicy, QWidget
+
+from functino.sample import ResourceSample
+
+
+class ResourceChart(QWidget):
+    """
+    Small chart of the CPU and memory usage of a run over time.
+
+    CPU utilization is scaled so that 100% (or the peak value, if higher) reaches the
+    top of the chart. Memory usage is scaled so that the peak value reaches the top.
+    """
+
+    cpu_color = QColor(Qt.GlobalColor.darkCyan)
+    rss_color = QColor(Qt.GlobalColor.darkMagenta)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.setFixedHeight(60)
+        self._samples: list[ResourceSample] = []
+
+    @property
+    def samples(self) -> tuple[ResourceSample, ...]:
+        """
+        The samples currently displayed in the chart.
+        """
+        return tuple(self._samples)
+
+    def add_sample(self, sample: ResourceSample) -> None:
+        """
+        Append a sample to the chart.
+        """
+        self._samples.append(sample)
+        self.update()
+
+    def set_samples(self, samples: tuple[ResourceSample, ...]) -> None:
+        """
+        Replace all samples in the chart.
+        """
+        self._samples = list(samples)
+        self.update()
+
+    def clear(self) -> None:
+        """
+        Remove all samples from the chart.
+        """
+        self.set_samples(())
+
+    def paintEvent(self, a0: QPaintEvent | None) -> None:
+        """
+        Reimplementation of paintEvent that draws the CPU and memory lines.
+        """
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        text_color = self.palette().color(QPalette.ColorRole.Text)
+        if not self._samples:
+            painter.setPen(QColor(Qt.GlobalColor.darkGray))
+            painter.drawText(
+                self.rect(), Qt.AlignmentFlag.AlignCenter, "no resource samples"
+            )
+            return
+        max_elapsed = max(self._samples[-1].elapsed, 1e-9)
+        peak_cpu = max(sample.cpu_percent for sample in self._samples)
+        peak_rss = max(sample.rss_bytes for sample in self._samples)
+        self._draw_line(
+            painter,
+            self.cpu_color,
+            [(s.elapsed, s.cpu_percent) for s in self._samples],
+            max_elapsed,
+            max(peak_cpu, 100.0),
+        )
+        self._draw_line(
+            painter,
+            self.rss_color,
+            [(s.elapsed, s.rss_bytes) for s in self._samples],
+            max_elapsed,
+            max(peak_rss, 1),
+        )
+        last_sample = self._samples[-1]
+        painter.setPen(text_color)
+        painter.drawText(
+            self.rect().adjusted(4, 2, -4, -2),
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop,
+            (
+                f"{last_sample.elapsed:.2f} s"
+                f"  CPU {last_sample.cpu_percent:.0f}% (peak {peak_cpu:.0f}%)"
+                f"  RSS {format_bytes(last_sample.rss_bytes)}"
+                f" (peak {format_bytes(peak_rss)})"
+            ),
+        )
+
+    def _draw_line(
+        self,
+        painter: QPainter,
+        color: QColor,
+        points: list[tuple[float, float]],
+        max_x: float,
+        max_y: float,
+    ) -> None:
+        """
+        Draw a line through the given points, scaled to fit the widget.
+        """
+        width = self.width() - 1
+        height = self.height() - 1
+        polygon = QPolygonF(
+            [QPointF(x / max_x * width, height - y / max_y * height) for x, y in points]
+        )
+        painter.setPen(QPen(color, 1.5))
+        painter.drawPolyline(polygon)
+
+
+def format_bytes(byte_count: float) -> str:
+    """
+    Format a byte count as a human-readable string.
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if byte_count < 1024:
+            return f"{byte_count:.1f} {unit}"
+        byte_count /= 1024
+    return f"{byte_count:.1f} TiB"
+
+
+def format_seconds(seconds: float) -> str:
+    """
+    Format a duration with a unit that suits its magnitude.
+    """
+    if seconds >= 1:
+        return f"{seconds:.3g} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3g} ms"
+    return f"{seconds * 1e6:.3g} µs"
@@ -0,0 +1,188 @@
+import shlex
+from typing import Any, Callable
+
+from PyQt6.QtCore import QMargins, pyqtSignal
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QComboBox, QHBoxLayout, QLineEdit, QVBoxLayout, QWidget
+
+from functino.codegen import CodegenResult, get_codegen, lookup_codegen
+from functino.daemon import get_codegen_via_daemon
+from functino.gui.editor import Editor
+from functino.gui.exception import pop_up_error_message
+from functino.gui.worker import Worker
+from functino.language import LanguageProfile
+
+
+class CodegenPanel(QWidget):
+    """
+    Panel that shows the code generated by the compiler for the editor's code.
+
+    Each line of generated code can map back to a line of source code. Moving the
+    cursor in this panel emits source_line_selected with the source line under the
+    cursor (or -1 if there is none).
+    """
+
+    source_line_selected = pyqtSignal(int)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._views_combo_box = QComboBox()
+        self._views_combo_box.setToolTip("Select Generated Code View")
+        self._flags_line_edit = QLineEdit()
+        self._flags_line_edit.setPlaceholderText("extra compiler flags (e.g. -O2)")
+        self._code_view = Editor()
+        self._code_view.setReadOnly(True)
+        self._language_profile: LanguageProfile | None = None
+        self._code = ""
+        self._result: CodegenResult | None = None
+        self._worker: Worker | None = None
+        self._worker_request: tuple | None = None
+        top_row_layout = QHBoxLayout()
+        top_row_layout.setContentsMargins(QMargins())
+        top_row_layout.addWidget(self._views_combo_box)
+        top_row_layout.addWidget(self._flags_line_edit)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(QMargins())
+        layout.addLayout(top_row_layout)
+        layout.addWidget(self._code_view)
+        self.setLayout(layout)
+        self._views_combo_box.currentIndexChanged.connect(self._update)
+        self._flags_line_edit.editingFinished.connect(self._update)
+        self._code_view.cursorPositionChanged.connect(self._on_cursor_position_changed)
+
+    def setFont(self, a0: QFont) -> None:
+        """
+        Reimplementation of setFont that also sets the font of the generated code.
+        """
+        self._code_view.setFont(a0)
+
+    def set_language_profile(self, language_profile: LanguageProfile | None) -> None:
+        """
+        Set the language profile used to generate code.
+        """
+        self._language_profile = language_profile
+        self._views_combo_box.blockSignals(True)
+        self._views_combo_box.clear()
+        if language_profile is not None:
+            self._views_combo_box.addItems(language_profile.codegen_views)
+        self._views_combo_box.blockSignals(False)
+        self._result = None
+        self._code_view.setText("")
+
+    def set_code(self, code: str) -> None:
+        """
+        Set the source code to generate code for and show the result.
+
+        Cached results are shown immediately; otherwise code generation happens in the
+        background.
+        """
+        self._code = code
+        self._update()
+
+    def highlight_source_line(self, source_line: int) -> None:
+        """
+        Highlight all generated lines that map to the given source line.
+        """
+        if self._result is None:
+            return
+        self._code_view.set_highlighted_lines(
+            i
+            for i, line in enumerate(self._result.lines)
+            if line.source_line == source_line
+        )
+
+    def wait(self) -> None:
+        """
+        Wait for any background code generation to finish.
+        """
+        if self._worker is not None:
+            self._worker.wait()
+
+    def _get_request(self) -> tuple[LanguageProfile, str, str, tuple[str, ...]] | None:
+        """
+        Return the arguments for code generation based on the current panel state, or
+        None if there's nothing to generate.
+        """
+        view_name = self._views_combo_box.currentText()
+        if self._language_profile is None or not view_name:
+            return None
+        try:
+            extra_flags = tuple(shlex.split(self._flags_line_edit.text()))
+        except ValueError:
+            extra_flags = ()
+        return (self._language_profile, view_name, self._code, extra_flags)
+
+    def _update(self) -> None:
+        """
+        Show the generated code for the current panel state, generating it in the
+        background if it isn't cached.
+
+        If the execution daemon is running, the code is generated there, so that all
+        windows share its cache.
+        """
+        request = self._get_request()
+        if request is None:
+            return
+        cached_result = lookup_codegen(*request)
+        if cached_result is not None:
+            self._show_result(cached_result)
+            return
+        if self._worker is not None:
+            # The request will be re-evaluated when the running worker finishes.
+            return
+        self._worker_request = request
+
+        def generate_code(_: Callable[[Any], None]) -> CodegenResult:
+            result = get_codegen_via_daemon(*request)
+            if result is None:
+                result = get_codegen(*request)
+            return result
+
+        self._worker = Worker(generate_code)
+        self._worker.succeeded.connect(self._on_codegen_succeeded)
+        self._worker.failed.connect(pop_up_error_message)
+        self._worker.finished.connect(self._on_codegen_finished)
+        self._worker.start()
+
+    def _on_codegen_succeeded(self, result: CodegenResult) -> None:
+        """
+        Show the result of background code generation, unless the panel state changed
+        while it ran (in which case _on_codegen_finished generates the code again).
+        """
+        if self._get_request() != self._worker_request:
+            return
+        self._show_result(result)
+
+    def _on_codegen_finished(self) -> None:
+        """
+        Clean up after background code generation and catch up with any changes that
+        happened in the meantime.
+        """
+        if self._worker is not None:
+            self._worker.wait()
+        self._worker = None
+        if self._get_request() != self._worker_request:
+            self._update()
+
+    def _show_result(self, result: CodegenResult) -> None:
+        """
+        Display the given code generation result.
+        """
+        if result is self._result:
+            return
+        self._result = result
+        first_visible_line = self._code_view.firstVisibleLine()
+        if result.error:
+            self._code_view.setText(result.error)
+        else:
+            self._code_view.setText("\n".join(line.text for line in result.lines))
+        self._code_view.setFirstVisibleLine(first_visible_line)
+
+    def _on_cursor_position_changed(self, line: int, index: int) -> None:
+        """
+        Emit the source line mapped to the generated line under the cursor.
+        """
+        source_line = None
+        if self._result is not None and line < len(self._result.lines):
+            source_line = self._result.lines[line].source_line
+        self.source_line_selected.emit(-1 if source_line is None else source_line)
@@ -1,8 +1,50 @@
+from typing import Iterable, Mapping, cast
+
 from PyQt6 import sip
-from PyQt6.Qsci import QsciLexer, QsciScintilla
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont, QPalette
-from PyQt6.QtWidgets import QFrame, QWidget
+from PyQt6.Qsci import QsciLexer, QsciScintilla, QsciStyle
+from PyQt6.QtCore import QEvent, QPoint, Qt, QTimer
+from PyQt6.QtGui import QColor, QFont, QHelpEvent, QPalette
+from PyQt6.QtWidgets import QFrame, QToolTip, QWidget
+
+from functino.execute import LineStats
+from functino.gui.chart import format_seconds
+from functino.precheck import Diagnostic
+
+
+class EditorState:
+    """
+    Snapshot of the user-visible state of an editor.
+
+    This is used to free editor widgets that aren't in use and rebuild them later.
+    """
+
+    def __init__(
+        self, text: str, cursor_position: tuple[int, int], first_visible_line: int
+    ) -> None:
+        self._text = text
+        self._cursor_position = cursor_position
+        self._first_visible_line = first_visible_line
+
+    @property
+    def text(self) -> str:
+        """
+        The text of the editor.
+        """
+        return self._text
+
+    @property
+    def cursor_position(self) -> tuple[int, int]:
+        """
+        The line and index of the cursor.
+        """
+        return self._cursor_position
+
+    @property
+    def first_visible_line(self) -> int:
+        """
+        The line scrolled to the top of the editor.
+        """
+        return self._first_visible_line
 
 
 class Editor(QsciScintilla):
@@ -10,6 +52,14 @@ class Editor(QsciScintilla):
     Editor widget.
     """
 
+    highlight_marker = 0
+    error_marker = 1
+    warning_marker = 2
+    diagnostics_margin = 1
+    heat_margin = 2
+    # Markers for the heat levels of lines, from coolest to hottest.
+    heat_markers = tuple(range(3, 11))
+
     def __init__(self, parent: QWidget | None = None) -> None:
         super().__init__(parent)
         self.setFrameStyle(QFrame.Shape.NoFrame)
@@ -23,6 +73,45 @@ class Editor(QsciScintilla):
         self.setAutoIndent(True)
         self.setBackspaceUnindents(True)
         self._lexer_copy = None
+        highlight_color = QColor(self.palette().color(QPalette.ColorRole.Highlight))
+        highlight_color.setAlpha(60)
+        self.markerDefine(QsciScintilla.MarkerSymbol.Background, self.highlight_marker)
+        self.setMarkerBackgroundColor(highlight_color, self.highlight_marker)
+        self._diagnostic_styles: dict[str, QsciStyle] = {}
+        base = self.palette().color(QPalette.ColorRole.Base)
+        for severity, marker, color in (
+            ("error", self.error_marker, QColor(Qt.GlobalColor.red)),
+            ("warning", self.warning_marker, QColor(255, 165, 0)),
+        ):
+            self.markerDefine(QsciScintilla.MarkerSymbol.Circle, marker)
+            self.setMarkerBackgroundColor(color, marker)
+            self.setMarkerForegroundColor(color, marker)
+            # Style backgrounds can't be translucent, so blend the tint by hand.
+            self._diagnostic_styles[severity] = QsciStyle(
+                -1, severity, color, _blend(base, color, 1 / 6), self.font()
+            )
+        self.setMarginType(
+            self.diagnostics_margin, QsciScintilla.MarginType.SymbolMargin
+        )
+        self.setMarginMarkerMask(
+            self.diagnostics_margin,
+            (1 << self.error_marker) | (1 << self.warning_marker),
+        )
+        self.setAnnotationDisplay(QsciScintilla.AnnotationDisplay.AnnotationIndented)
+        # The statistics of each line of the heat map, by the handle of its marker, so
+        # that they follow the line when lines are inserted or deleted above it.
+        self._heat_marker_stats: dict[int, LineStats] = {}
+        heat_color = QColor(255, 64, 0)
+        heat_marker_mask = 0
+        for level, marker in enumerate(self.heat_markers, start=1):
+            self.markerDefine(QsciScintilla.MarkerSymbol.FullRectangle, marker)
+            self.setMarkerBackgroundColor(
+                _blend(base, heat_color, level / len(self.heat_markers)), marker
+            )
+            heat_marker_mask |= 1 << marker
+        self.setMarginType(self.heat_margin, QsciScintilla.MarginType.SymbolMargin)
+        self.setMarginMarkerMask(self.heat_margin, heat_marker_mask)
+        self.setMarginWidth(self.heat_margin, 0)
 
     def setFont(self, f: QFont) -> None:
         """
@@ -36,9 +125,11 @@ class Editor(QsciScintilla):
         apparently the notification happens at some other point in the event loop.
         """
         super().setFont(f)
+        for style in self._diagnostic_styles.values():
+            style.setFont(f)
         QTimer.singleShot(10, self.reset_line_number_margin_width)
 
-    def setLexer(self, lexer: QsciLexer) -> None:
+    def setLexer(self, lexer: QsciLexer | None) -> None:
         """
         Reimplementation of setLexer so that we can keep an external reference to the
         lexer.
@@ -69,3 +160,130 @@ class Editor(QsciScintilla):
             sip.voidptr(b"0"),
         )
         self.setMarginWidth(0, round(margin_width * 2.5))
+
+    def set_highlighted_lines(self, lines: Iterable[int]) -> None:
+        """
+        Highlight the background of the given lines, replacing any previous highlights.
+        """
+        self.markerDeleteAll(self.highlight_marker)
+        for line in lines:
+            self.markerAdd(line, self.highlight_marker)
+
+    def set_diagnostics_margin_visible(self, visible: bool) -> None:
+        """
+        Show or hide the margin that marks lines with errors and warnings.
+        """
+        self.setMarginWidth(self.diagnostics_margin, "00" if visible else "")
+
+    def set_diagnostics(self, diagnostics: Iterable[Diagnostic]) -> None:
+        """
+        Mark the lines of the given diagnostics in the margin and show their messages
+        below the lines, replacing any previous diagnostics.
+        """
+        self.markerDeleteAll(self.error_marker)
+        self.markerDeleteAll(self.warning_marker)
+        self.clearAnnotations()
+        messages: dict[int, list[str]] = {}
+        severities: dict[int, str] = {}
+        for diagnostic in diagnostics:
+            messages.setdefault(diagnostic.line, []).append(
+                f"{diagnostic.severity}: {diagnostic.message}"
+            )
+            if severities.get(diagnostic.line) != "error":
+                severities[diagnostic.line] = diagnostic.severity
+        for line, severity in severities.items():
+            marker = self.error_marker if severity == "error" else self.warning_marker
+            self.markerAdd(line, marker)
+            self.annotate(
+                line, "\n".join(messages[line]), self._diagnostic_styles[severity]
+            )
+
+    def set_line_stats(self, line_stats: Mapping[int, LineStats]) -> None:
+        """
+        Show a heat map of the given per-line execution statistics in a margin.
+
+        Lines are colored by their share of the time of the hottest line, and hovering
+        over the margin shows the exact numbers. Empty statistics hide the heat map.
+        """
+        self._heat_marker_stats = {}
+        for marker in self.heat_markers:
+            self.markerDeleteAll(marker)
+        if not line_stats:
+            self.setMarginWidth(self.heat_margin, 0)
+            return
+        self.setMarginWidth(self.heat_margin, "0")
+        max_time = max(stats.time for stats in line_stats.values()) or 1.0
+        for line, stats in line_stats.items():
+            level = round(stats.time / max_time * (len(self.heat_markers) - 1))
+            handle = self.markerAdd(line, self.heat_markers[level])
+            if handle >= 0:
+                self._heat_marker_stats[handle] = stats
+
+    def viewportEvent(self, event: QEvent | None) -> bool:
+        """
+        Reimplementation of viewportEvent that shows the statistics of a line as a
+        tooltip when hovering over the heat map margin.
+        """
+        if event is not None and event.type() == QEvent.Type.ToolTip:
+            help_event = cast(QHelpEvent, event)
+            tooltip = self._get_heat_tooltip(help_event.pos())
+            if tooltip:
+                QToolTip.showText(help_event.globalPos(), tooltip, self.viewport())
+                return True
+        return super().viewportEvent(event)
+
+    def _get_heat_tooltip(self, pos: QPoint) -> str:
+        """
+        Return the tooltip for the given viewport position, or an empty string if the
+        position isn't on a line of the heat map.
+        """
+        margin_start = sum(self.marginWidth(i) for i in range(self.heat_margin))
+        margin_end = margin_start + self.marginWidth(self.heat_margin)
+        if not self._heat_marker_stats or not margin_start <= pos.x() < margin_end:
+            return ""
+        position = self.SendScintilla(
+            QsciScintilla.SCI_POSITIONFROMPOINT, margin_end, pos.y()
+        )
+        line = self.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+        stats = next(
+            (
+                stats
+                for handle, stats in self._heat_marker_stats.items()
+                if self.markerLine(handle) == line
+            ),
+            None,
+        )
+        if stats is None:
+            return f"line {line + 1}: not executed"
+        return (
+            f"line {line + 1}: {stats.hits:,} hits,"
+            f" {format_seconds(stats.time)} total,"
+            f" {format_seconds(stats.time / stats.hits)} per hit"
+        )
+
+    def save_state(self) -> EditorState:
+        """
+        Return a snapshot of the text, cursor and scroll position of this editor.
+        """
+        return EditorState(
+            self.text(), self.getCursorPosition(), self.firstVisibleLine()
+        )
+
+    def restore_state(self, state: EditorState) -> None:
+        """
+        Restore a snapshot taken with save_state.
+        """
+        self.setText(state.text)
+        self.setCursorPosition(*state.cursor_position)
+        self.setFirstVisibleLine(state.first_visible_line)
+
+
+def _blend(color: QColor, other_color: QColor, fraction: float) -> QColor:
+    """
+    Return the color that is the given fraction of the way from color to other_color.
+    """
+    return QColor(
+        round(color.red() + (other_color.red() - color.red()) * fraction),
+        round(color.green() + (other_color.green() - color.green()) * fraction),
+        round(color.blue() + (other_color.blue() - color.blue()) * fraction),
+    )
@@ -0,0 +1,342 @@
+from datetime import datetime
+import sqlite3
+from statistics import median
+from typing import Callable
+
+from PyQt6.QtCore import QEvent, QMargins, QPointF, Qt
+from PyQt6.QtGui import (
+    QColor,
+    QHelpEvent,
+    QPainter,
+    QPaintEvent,
+    QPalette,
+    QPen,
+    QPolygonF,
+)
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSizePolicy,
+    QToolTip,
+    QVBoxLayout,
+    QWidget,
+)
+
+from functino.execute import RunTimings
+from functino.gui.chart import format_bytes, format_seconds
+from functino.gui.exception import pop_up_error_message
+from functino.history import HistoryEntry, get_performance_history
+from functino.language import LanguageProfile
+
+# The timings that the history chart can show, with how to get and format them.
+_METRICS: dict[str, tuple[Callable[[RunTimings], float | None], Callable]] = {
+    "Run Time": (lambda timings: timings.run_time, format_seconds),
+    "CPU Time": (lambda timings: timings.cpu_time, format_seconds),
+    "Peak RSS": (lambda timings: timings.peak_rss_bytes, format_bytes),
+    "Compile Time": (lambda timings: timings.compile_time, format_seconds),
+}
+
+
+class HistoryChart(QWidget):
+    """
+    Chart of one timing of the recent runs of a profile, oldest first.
+
+    Runs of the current revision are highlighted, and the median of the baseline's runs
+    is drawn as a dashed line. Hovering over a run shows all of its timings.
+    """
+
+    baseline_color = QColor(Qt.GlobalColor.darkGreen)
+    current_color = QColor(Qt.GlobalColor.darkCyan)
+    other_color = QColor(Qt.GlobalColor.darkGray)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.setFixedHeight(100)
+        self._entries: tuple[HistoryEntry, ...] = ()
+        self._metric = next(iter(_METRICS))
+        self._current_revision: int | None = None
+        self._baseline_revision: int | None = None
+        self._baseline_value: float | None = None
+
+    def set_entries(
+        self,
+        entries: tuple[HistoryEntry, ...],
+        current_revision: int | None,
+        baseline_revision: int | None,
+    ) -> None:
+        """
+        Replace the runs in the chart.
+        """
+        self._entries = entries
+        self._current_revision = current_revision
+        self._baseline_revision = baseline_revision
+        self._update_baseline_value()
+        self.update()
+
+    def set_metric(self, metric: str) -> None:
+        """
+        Set which timing the chart shows (one of the keys of _METRICS).
+        """
+        self._metric = metric
+        self._update_baseline_value()
+        self.update()
+
+    def event(self, a0: QEvent | None) -> bool:
+        """
+        Reimplementation of event that shows the timings of the run under the mouse.
+        """
+        if a0 is not None and a0.type() == QEvent.Type.ToolTip:
+            help_event: QHelpEvent = a0  # type: ignore
+            entry = self._get_entry_at(help_event.pos().x())
+            if entry is not None:
+                QToolTip.showText(
+                    help_event.globalPos(), _get_entry_tooltip(entry), self
+                )
+            else:
+                QToolTip.hideText()
+            return True
+        return super().event(a0)
+
+    def paintEvent(self, a0: QPaintEvent | None) -> None:
+        """
+        Reimplementation of paintEvent that draws the runs.
+        """
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        get_value, format_value = _METRICS[self._metric]
+        points = [
+            (i, entry, value)
+            for i, entry in enumerate(self._entries)
+            if (value := get_value(entry.timings)) is not None
+        ]
+        if not points:
+            painter.setPen(QColor(Qt.GlobalColor.darkGray))
+            painter.drawText(
+                self.rect(),
+                Qt.AlignmentFlag.AlignCenter,
+                f"no {self._metric.lower()} history",
+            )
+            return
+        max_value = max(max(value for _, _, value in points), 1e-12)
+        if self._baseline_value is not None:
+            max_value = max(max_value, self._baseline_value)
+        height = self.height() - 1
+        polygon = QPolygonF(
+            [
+                QPointF(self._get_x(i), height - value / max_value * height * 0.9)
+                for i, _, value in points
+            ]
+        )
+        painter.setPen(QPen(self.other_color, 1))
+        painter.drawPolyline(polygon)
+        for point, (_, entry, _) in zip(polygon, points):
+            color = self.other_color
+            if entry.revision == self._current_revision:
+                color = self.current_color
+            elif entry.revision == self._baseline_revision:
+                color = self.baseline_color
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(color)
+            painter.drawEllipse(point, 3, 3)
+        if self._baseline_value is not None:
+            baseline_y = height - self._baseline_value / max_value * height * 0.9
+            painter.setPen(QPen(self.baseline_color, 1, Qt.PenStyle.DashLine))
+            painter.drawLine(QPointF(0, baseline_y), QPointF(self.width(), baseline_y))
+        painter.setPen(self.palette().color(QPalette.ColorRole.Text))
+        painter.drawText(
+            self.rect().adjusted(4, 2, -4, -2),
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop,
+            f"max {format_value(max_value)}",
+        )
+
+    def _get_x(self, entry_index: int) -> float:
+        """
+        Return the x coordinate of the run with the given index.
+        """
+        if len(self._entries) < 2:
+            return self.width() / 2
+        return 4 + entry_index / (len(self._entries) - 1) * (self.width() - 9)
+
+    def _get_entry_at(self, x: int) -> HistoryEntry | None:
+        """
+        Return the run drawn closest to the given x coordinate, if it's close enough.
+        """
+        if not self._entries:
+            return None
+        entry_index = min(
+            range(len(self._entries)), key=lambda i: abs(self._get_x(i) - x)
+        )
+        if abs(self._get_x(entry_index) - x) > 8:
+            return None
+        return self._entries[entry_index]
+
+    def _update_baseline_value(self) -> None:
+        """
+        Compute the median of the shown timing over the baseline's runs in the chart.
+        """
+        get_value, _ = _METRICS[self._metric]
+        values = [
+            value
+            for entry in self._entries
+            if entry.revision == self._baseline_revision
+            and (value := get_value(entry.timings)) is not None
+        ]
+        self._baseline_value = median(values) if values else None
+
+
+class HistoryPanel(QWidget):
+    """
+    Panel that shows the performance history of the current profile.
+
+    The current revision can be pinned as the baseline; the panel flags the current
+    revision if it's significantly slower than the baseline (see
+    PerformanceHistory.check_regression).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._metrics_combo_box = QComboBox()
+        self._metrics_combo_box.setToolTip("Select Timing")
+        self._metrics_combo_box.addItems(_METRICS)
+        self._summary_label = QLabel()
+        self._pin_button = QPushButton("Pin Baseline")
+        self._pin_button.setToolTip("Pin the Current Revision as the Baseline")
+        self._unpin_button = QPushButton("Unpin")
+        self._unpin_button.setToolTip("Remove the Baseline")
+        self._chart = HistoryChart()
+        self._language_profile: LanguageProfile | None = None
+        self._code = ""
+        self._regression_threshold = 0.1
+        top_row_layout = QHBoxLayout()
+        top_row_layout.setContentsMargins(QMargins())
+        top_row_layout.addWidget(self._metrics_combo_box)
+        top_row_layout.addWidget(self._summary_label, 1)
+        top_row_layout.addWidget(self._pin_button)
+        top_row_layout.addWidget(self._unpin_button)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(QMargins())
+        layout.addLayout(top_row_layout)
+        layout.addWidget(self._chart)
+        self.setLayout(layout)
+        self._metrics_combo_box.currentTextChanged.connect(self._chart.set_metric)
+        self._pin_button.clicked.connect(self._on_pin_click)
+        self._unpin_button.clicked.connect(self._on_unpin_click)
+
+    def set_language_profile(self, language_profile: LanguageProfile | None) -> None:
+        """
+        Set the profile whose history is shown.
+        """
+        self._language_profile = language_profile
+
+    def set_code(self, code: str) -> None:
+        """
+        Set the code of the current revision.
+        """
+        self._code = code
+
+    @property
+    def regression_threshold(self) -> float:
+        """
+        How much slower than the baseline (e.g. 0.1 for 10%) the current revision must
+        be to be flagged.
+        """
+        return self._regression_threshold
+
+    @regression_threshold.setter
+    def regression_threshold(self, value: float) -> None:
+        """
+        Set how much slower than the baseline the current revision must be to be
+        flagged.
+        """
+        self._regression_threshold = value
+
+    def refresh(self) -> None:
+        """
+        Reload the history from the database and show it.
+        """
+        if self._language_profile is None:
+            self._chart.set_entries((), None, None)
+            self._summary_label.clear()
+            return
+        profile_name = self._language_profile.name
+        try:
+            history = get_performance_history()
+            entries = history.get_runs(profile_name)
+            current_revision = history.get_revision(profile_name, self._code)
+            baseline_revision = history.get_baseline(profile_name)
+            regression_check = history.check_regression(
+                profile_name, self._code, self._regression_threshold
+            )
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            self._chart.set_entries((), None, None)
+            self._summary_label.setText(f"history unavailable: {e}")
+            return
+        self._chart.set_entries(entries, current_revision, baseline_revision)
+        self._unpin_button.setEnabled(baseline_revision is not None)
+        summary = "current revision never ran"
+        if current_revision is not None:
+            summary = f"r{current_revision}"
+        if baseline_revision is not None:
+            summary += f", baseline r{baseline_revision}"
+        summary_color = ""
+        if regression_check is not None and current_revision != baseline_revision:
+            summary += (
+                f": {format_seconds(regression_check.run_time)} vs"
+                f" {format_seconds(regression_check.baseline_run_time)}"
+                f" ({regression_check.change:+.0%})"
+            )
+            if regression_check.regressed:
+                summary += ", regression"
+                summary_color = "red"
+        self._summary_label.setStyleSheet(
+            f"color: {summary_color};" if summary_color else ""
+        )
+        self._summary_label.setText(summary)
+
+    def _on_pin_click(self) -> None:
+        """
+        Pin the current revision as the baseline.
+        """
+        if self._language_profile is None:
+            return
+        try:
+            get_performance_history().pin_baseline(
+                self._language_profile.name, self._code
+            )
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            pop_up_error_message(e)
+        self.refresh()
+
+    def _on_unpin_click(self) -> None:
+        """
+        Remove the baseline.
+        """
+        if self._language_profile is None:
+            return
+        try:
+            get_performance_history().unpin_baseline(self._language_profile.name)
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            pop_up_error_message(e)
+        self.refresh()
+
+
+def _get_entry_tooltip(entry: HistoryEntry) -> str:
+    """
+    Describe the timings of a run for its tooltip.
+    """
+    timings = entry.timings
+    lines = [
+        f"r{entry.revision}"
+        f" at {datetime.fromtimestamp(entry.timestamp):%Y-%m-%d %H:%M:%S}",
+        f"run: {format_seconds(timings.run_time)}",
+    ]
+    if timings.cpu_time is not None:
+        lines.append(f"CPU: {format_seconds(timings.cpu_time)}")
+    if timings.peak_rss_bytes is not None:
+        lines.append(f"peak RSS: {format_bytes(timings.peak_rss_bytes)}")
+    if timings.compile_time is not None:
+        lines.append(f"compile: {format_seconds(timings.compile_time)}")
+    return "\n".join(lines)
@@ -0,0 +1,361 @@
+from bisect import bisect_left
+import re
+import threading
+
+from PyQt6.QtCore import QMargins, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import (
+    QColor,
+    QFont,
+    QKeySequence,
+    QShortcut,
+    QTextCharFormat,
+    QTextCursor,
+    QTextDocument,
+)
+from PyQt6.QtWidgets import (
+    QCheckBox,
+    QFrame,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPlainTextDocumentLayout,
+    QPlainTextEdit,
+    QPushButton,
+    QWidget,
+)
+
+from functino.gui.worker import Worker
+from functino.line_index import LineIndex, SearchResult
+
+
+class OutputWidget(QPlainTextEdit):
+    """
+    Widget for displaying the results of executing the code in the editor.
+
+    All displayed output is also kept in a line index so that it can be searched
+    quickly. The widget can switch to a filtered view that only shows selected lines;
+    the full output document is kept as is while the filtered view is shown.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._line_index = LineIndex()
+        self._segments: list[tuple[int, QColor | None]] = []
+        # The full document must not be a child of this widget, otherwise Qt deletes it
+        # when switching to a filtered document.
+        self._full_document = QTextDocument()
+        self._full_document.setDocumentLayout(
+            QPlainTextDocumentLayout(self._full_document)
+        )
+        self._filtered_lines: list[int] | None = None
+        self.setDocument(self._full_document)
+        self.setReadOnly(True)
+        self.setFrameStyle(QFrame.Shape.NoFrame)
+        font = self.font()
+        font.setPointSize(12)
+        self.setFont(font)
+
+    @property
+    def line_index(self) -> LineIndex:
+        """
+        The line index of the output.
+        """
+        return self._line_index
+
+    @property
+    def filtered_lines(self) -> list[int] | None:
+        """
+        The lines shown in the filtered view, or None if the full output is shown.
+        """
+        return self._filtered_lines
+
+    def setFont(self, a0: QFont) -> None:
+        """
+        Reimplementation of setFont that also sets the font of the inactive document.
+        """
+        super().setFont(a0)
+        self._full_document.setDefaultFont(a0)
+
+    def clear(self) -> None:
+        """
+        Reimplementation of clear that also clears the line index.
+        """
+        self.set_filtered_lines(None)
+        super().clear()
+        self._line_index = LineIndex()
+        self._segments = []
+
+    def append_output(self, text: str, color: QColor | None = None) -> None:
+        """
+        Append text in a new paragraph, optionally in the given color.
+        """
+        if self._filtered_lines is not None:
+            self.set_filtered_lines(None)
+        # Qt treats carriage returns as paragraph separators, so normalize them to keep
+        # the document's lines in sync with the line index.
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if self._line_index.text:
+            self._line_index.append("\n")
+        self._segments.append((self._line_index.line_count - 1, color))
+        self._line_index.append(text)
+        text_format = QTextCharFormat()
+        if color is not None:
+            text_format.setForeground(color)
+        cursor = QTextCursor(self._full_document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        if not self._full_document.isEmpty():
+            cursor.insertBlock()
+        cursor.insertText(text, text_format)
+
+    def show_placeholder(self, text: str) -> None:
+        """
+        Replace the output with a greyed out placeholder message.
+        """
+        self.clear()
+        text_color_hex = QColor(Qt.GlobalColor.darkGray).name(QColor.NameFormat.HexArgb)
+        self.appendHtml(f'<span style="color:{text_color_hex}"><em>{text}</em></span>')
+
+    def set_filtered_lines(self, lines: list[int] | None) -> None:
+        """
+        Show only the given lines of the output, or the full output if lines is None.
+
+        The filtered view is a separate document built from the line index, so
+        switching views doesn't touch the full output document.
+        """
+        self._filtered_lines = lines
+        if self.document() is not self._full_document:
+            # This also deletes the filtered document since it's a child of this widget.
+            self.setDocument(self._full_document)
+        if lines is None:
+            return
+        filtered_document = QTextDocument(self)
+        filtered_document.setDocumentLayout(QPlainTextDocumentLayout(filtered_document))
+        filtered_document.setDefaultFont(self.font())
+        cursor = QTextCursor(filtered_document)
+        # Insert the lines of each colored segment in bulk, since inserting line by line
+        # is slow for large outputs.
+        line_position = 0
+        for i, (_, color) in enumerate(self._segments):
+            end_line = self._line_index.line_count
+            if i + 1 < len(self._segments):
+                end_line = self._segments[i + 1][0]
+            segment_line_count = bisect_left(lines, end_line, lo=line_position)
+            segment_line_count -= line_position
+            if segment_line_count == 0:
+                continue
+            segment_lines = lines[line_position : line_position + segment_line_count]
+            line_position += segment_line_count
+            text_format = QTextCharFormat()
+            if color is not None:
+                text_format.setForeground(color)
+            if not filtered_document.isEmpty():
+                cursor.insertBlock()
+            cursor.insertText(
+                "\n".join(map(self._line_index.line_text, segment_lines)), text_format
+            )
+        self.setDocument(filtered_document)
+
+    def select_match(self, start: int, end: int) -> None:
+        """
+        Select the text between the given line index offsets and scroll to it.
+        """
+        line = self._line_index.line_of(start)
+        block_number = line
+        if self._filtered_lines is not None:
+            block_number = bisect_left(self._filtered_lines, line)
+            if self._filtered_lines[block_number : block_number + 1] != [line]:
+                return
+        block = self.document().findBlockByNumber(block_number)
+        line_start = self._line_index.line_start(line)
+        line_text = self._line_index.line_text(line)
+        # Qt positions count UTF-16 code units rather than code points.
+        column = _utf16_length(line_text[: start - line_start])
+        length = _utf16_length(line_text[start - line_start : end - line_start])
+        cursor = QTextCursor(block)
+        cursor.movePosition(
+            QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.MoveAnchor, column
+        )
+        cursor.movePosition(
+            QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor, length
+        )
+        self.setTextCursor(cursor)
+        self.centerCursor()
+
+
+class OutputSearchBar(QWidget):
+    """
+    Search bar for the output widget.
+
+    Searches run in a background thread as the pattern is typed. The bar shows the
+    number of matches, can jump to the next match, and can filter the output down to
+    the matching lines.
+    """
+
+    closed = pyqtSignal()
+
+    def __init__(self, output_widget: OutputWidget) -> None:
+        super().__init__()
+        self._output_widget = output_widget
+        self._pattern_line_edit = QLineEdit()
+        self._pattern_line_edit.setPlaceholderText("search output (regex)")
+        self._counter_label = QLabel()
+        self._next_button = QPushButton("Next")
+        self._next_button.setToolTip("Jump to Next Match (Enter)")
+        self._filter_check_box = QCheckBox("Only matching lines")
+        self._result: SearchResult | None = None
+        self._result_pattern: str | None = None
+        self._current_match = -1
+        self._worker: Worker | None = None
+        self._cancel_event = threading.Event()
+        self._search_timer = QTimer()
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(QMargins())
+        layout.addWidget(self._pattern_line_edit)
+        layout.addWidget(self._counter_label)
+        layout.addWidget(self._next_button)
+        layout.addWidget(self._filter_check_box)
+        self.setLayout(layout)
+        self._pattern_line_edit.textChanged.connect(self._search_timer.start)
+        self._pattern_line_edit.returnPressed.connect(self.on_next)
+        self._search_timer.timeout.connect(self.search)
+        self._next_button.clicked.connect(self.on_next)
+        self._filter_check_box.toggled.connect(self._apply_filter)
+        escape_shortcut = QShortcut(QKeySequence("Escape"), self)
+        escape_shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        escape_shortcut.activated.connect(self.close_search)
+
+    def open_search(self) -> None:
+        """
+        Show the search bar and focus the pattern.
+        """
+        self.show()
+        self._pattern_line_edit.setFocus()
+        self._pattern_line_edit.selectAll()
+
+    def close_search(self) -> None:
+        """
+        Hide the search bar and show the full output again.
+        """
+        self._filter_check_box.setChecked(False)
+        self.hide()
+        self.closed.emit()
+
+    def search(self) -> None:
+        """
+        Search the output for the current pattern in the background.
+
+        If a search is already running, it is cancelled and the new search starts once
+        it has stopped.
+        """
+        pattern_text = self._pattern_line_edit.text()
+        self._result = None
+        self._current_match = -1
+        if self._worker is not None:
+            self._cancel_event.set()
+            return
+        if not pattern_text:
+            self._set_result(None, "")
+            return
+        try:
+            pattern = re.compile(pattern_text, re.MULTILINE)
+        except re.error:
+            self._set_result(None, "invalid regex")
+            return
+        self._counter_label.setText("searching...")
+        self._cancel_event = threading.Event()
+        line_index = self._output_widget.line_index
+        cancel_event = self._cancel_event
+        self._worker = Worker(lambda _: line_index.search(pattern, cancel_event))
+        self._worker.succeeded.connect(
+            lambda result: self._on_search_succeeded(result, pattern_text, line_index)
+        )
+        self._worker.finished.connect(self._on_search_finished)
+        self._worker.start()
+
+    def on_next(self) -> None:
+        """
+        Select the next match in the output, wrapping around at the end.
+        """
+        if self._result is None or not self._result.matches:
+            return
+        self._current_match = (self._current_match + 1) % len(self._result.matches)
+        self._output_widget.select_match(*self._result.matches[self._current_match])
+        self._update_counter()
+
+    def wait(self) -> None:
+        """
+        Cancel any running search and wait for it to stop.
+        """
+        if self._worker is not None:
+            self._cancel_event.set()
+            self._worker.wait()
+
+    def _on_search_succeeded(
+        self, result: SearchResult | None, pattern_text: str, line_index: LineIndex
+    ) -> None:
+        """
+        Show the result of a background search if it is still relevant.
+        """
+        if (
+            result is not None
+            and pattern_text == self._pattern_line_edit.text()
+            and line_index is self._output_widget.line_index
+        ):
+            self._result_pattern = pattern_text
+            self._set_result(result, "")
+
+    def _on_search_finished(self) -> None:
+        """
+        Clean up after a background search and start a new one if the pattern or output
+        changed in the meantime.
+        """
+        if self._worker is not None:
+            self._worker.wait()
+        self._worker = None
+        if self._result_pattern != self._pattern_line_edit.text() or (
+            self._cancel_event.is_set()
+        ):
+            self.search()
+
+    def _set_result(self, result: SearchResult | None, message: str) -> None:
+        """
+        Replace the current search result.
+        """
+        self._result = result
+        self._current_match = -1
+        if result is None:
+            self._result_pattern = None
+            self._counter_label.setText(message)
+        else:
+            self._update_counter()
+        self._apply_filter()
+
+    def _update_counter(self) -> None:
+        """
+        Show the position of the current match and the number of matches.
+        """
+        if self._result is None:
+            return
+        match_count = len(self._result.matches)
+        self._counter_label.setText(
+            f"{self._current_match + 1 if self._current_match >= 0 else '-'}"
+            f" / {match_count} ({len(self._result.lines)} lines)"
+        )
+
+    def _apply_filter(self) -> None:
+        """
+        Filter the output down to the matching lines if filtering is enabled.
+        """
+        if self._filter_check_box.isChecked() and self._result is not None:
+            self._output_widget.set_filtered_lines(self._result.lines)
+        else:
+            self._output_widget.set_filtered_lines(None)
+
+
+def _utf16_length(text: str) -> int:
+    """
+    Return the length of the text in UTF-16 code units.
+    """
+    return len(text.encode("utf-16-le")) // 2
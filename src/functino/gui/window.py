@@ -1,6 +1,9 @@
-from typing import cast
+from collections import OrderedDict
+import sqlite3
+from typing import Callable, cast
 
-from PyQt6.QtCore import QMargins, QSettings, Qt
+from PyQt6.Qsci import QsciLexer
+from PyQt6.QtCore import QMargins, QSettings, Qt, QTimer
 from PyQt6.QtGui import (
     QCloseEvent,
     QColor,
@@ -14,24 +17,36 @@ from PyQt6.QtWidgets import (
     QPushButton,
     QComboBox,
     QFontDialog,
-    QFrame,
     QHBoxLayout,
     QMainWindow,
     QStackedLayout,
-    QTextEdit,
     QSizePolicy,
     QSplitter,
+    QStatusBar,
     QVBoxLayout,
     QWidget,
 )
 
-from functino.execute import get_output
-from functino.gui.editor import Editor
+from functino.build import BuildResult, build, lookup_build
+from functino.daemon import get_output_via_daemon
+from functino.execute import RunResult, RunTimings, get_output
+from functino.gui.chart import ResourceChart
+from functino.gui.codegen import CodegenPanel
+from functino.gui.editor import Editor, EditorState
 from functino.gui.exception import pop_up_error_message
+from functino.gui.history import HistoryPanel
 from functino.gui.icon import IconSet
 from functino.gui.language import get_lexer_class
+from functino.gui.output import OutputSearchBar, OutputWidget
 from functino.gui.theme import Theme, get_uniform_palette
+from functino.gui.worker import Worker
+from functino.history import get_performance_history
 from functino.language import LanguageProfile, get_language_profiles
+from functino.precheck import PrecheckResult, lookup_precheck, precheck, quick_precheck
+from functino.sample import ResourceSample
+from functino.schedule import Priority, get_scheduler
+from functino.session import Session
+from functino.trace import Span, export_trace, set_tracing_enabled, span
 
 
 class UniformSplitter(QSplitter):
@@ -45,20 +60,6 @@ class UniformSplitter(QSplitter):
         self.setAutoFillBackground(True)
 
 
-class OutputWidget(QTextEdit):
-    """
-    Widget for displaying the results of executing the code in the editor.
-    """
-
-    def __init__(self) -> None:
-        super().__init__()
-        self.setReadOnly(True)
-        self.setFrameStyle(QFrame.Shape.NoFrame)
-        font = self.font()
-        font.setPointSize(12)
-        self.setFont(font)
-
-
 class MainWindow(QMainWindow):
     """
     Main window for this application.
@@ -74,92 +75,392 @@ class MainWindow(QMainWindow):
         self._run_button = SvgButton(self._icon_set.play_icon_data)
         self._run_button.setToolTip("Run (Ctrl+r)")
         self._settings_button = SvgButton(self._icon_set.settings_icon_data)
+        self._codegen_button = QPushButton("Asm")
+        self._codegen_button.setToolTip("Show Generated Code (Ctrl+Shift+a)")
+        self._codegen_button.setCheckable(True)
+        self._heat_map_button = QPushButton("Heat")
+        self._heat_map_button.setToolTip("Profile Lines of Runs (Ctrl+Shift+h)")
+        self._heat_map_button.setCheckable(True)
+        self._session_button = QPushButton("Session")
+        self._session_button.setToolTip(
+            "Run Cells in a Persistent Session (Ctrl+Shift+s)"
+        )
+        self._session_button.setCheckable(True)
+        self._restart_session_button = QPushButton("Restart")
+        self._restart_session_button.setToolTip("Restart Session (Ctrl+Shift+r)")
+        self._restart_session_button.setEnabled(False)
+        self._sessions: dict[str, Session] = {}
+        self._history_button = QPushButton("History")
+        self._history_button.setToolTip("Show Performance History (Ctrl+Shift+p)")
+        self._history_button.setCheckable(True)
+        self._history_panel = HistoryPanel()
+        self._history_panel.hide()
+        self._codegen_panel = CodegenPanel()
+        self._codegen_panel.hide()
+        self._typing_pause_timer = QTimer()
+        self._typing_pause_timer.setSingleShot(True)
+        self._typing_pause_timer.setInterval(500)
+        self._build_worker: Worker | None = None
+        self._last_build_request: tuple[LanguageProfile, str] | None = None
+        self._precheck_worker: Worker | None = None
+        self._last_precheck_request: tuple[LanguageProfile, str] | None = None
         self._editors_layout = QStackedLayout()
         self._output_widget = OutputWidget()
+        self._output_search_bar = OutputSearchBar(self._output_widget)
+        self._output_search_bar.hide()
+        self._resource_chart = ResourceChart()
+        self._run_worker: Worker | None = None
+        self._run_span: Span | None = None
+        self._run_history_request: tuple[LanguageProfile, str] | None = None
+        self._run_editor: Editor | None = None
+        self._trace_file_path = ""
         self._main_splitter = self._make_main_splitter()
         self.setCentralWidget(self._main_splitter)
         self._populate_languages_combobox()
         self._restore_window_state()
-        self._editor_index_map: dict[int, int] = {}
+        self._codegen_panel.setFont(self._output_widget.font())
+        self._editors: OrderedDict[int, Editor] = OrderedDict()
+        self._editor_states: dict[int, EditorState] = {}
+        self._lexer_pool: dict[str, list[QsciLexer]] = {}
         self.switch_editor()
         self._languages_combo_box.currentIndexChanged.connect(self.switch_editor)
         self._run_button.clicked.connect(self.on_run)
         QShortcut(QKeySequence("Ctrl+r"), self).activated.connect(self.on_run)
         self._settings_button.clicked.connect(self.on_settings_click)
+        QShortcut(QKeySequence("Ctrl+f"), self).activated.connect(
+            self._output_search_bar.open_search
+        )
+        self._codegen_button.toggled.connect(self.on_codegen_toggled)
+        self._heat_map_button.toggled.connect(self.on_heat_map_toggled)
+        QShortcut(QKeySequence("Ctrl+Shift+h"), self).activated.connect(
+            self._heat_map_button.click
+        )
+        QShortcut(QKeySequence("Ctrl+Shift+a"), self).activated.connect(
+            self._codegen_button.click
+        )
+        self._session_button.toggled.connect(self.on_session_toggled)
+        QShortcut(QKeySequence("Ctrl+Shift+s"), self).activated.connect(
+            self._session_button.click
+        )
+        self._restart_session_button.clicked.connect(self.on_restart_session)
+        QShortcut(QKeySequence("Ctrl+Shift+r"), self).activated.connect(
+            self._restart_session_button.click
+        )
+        self._history_button.toggled.connect(self.on_history_toggled)
+        QShortcut(QKeySequence("Ctrl+Shift+p"), self).activated.connect(
+            self._history_button.click
+        )
+        self._typing_pause_timer.timeout.connect(self._on_typing_paused)
+        self._codegen_panel.source_line_selected.connect(self._on_codegen_line_selected)
 
     def closeEvent(self, a0: QCloseEvent) -> None:
         """
         Handle window closed event.
         """
+        # Stopping the sessions first interrupts a cell that is still running.
+        for session in self._sessions.values():
+            session.restart()
+        if self._run_worker is not None:
+            self._run_worker.wait()
+        self._codegen_panel.wait()
+        self._output_search_bar.wait()
+        if self._build_worker is not None:
+            self._build_worker.wait()
+        if self._precheck_worker is not None:
+            self._precheck_worker.wait()
         self._save_window_state()
         return super().closeEvent(a0)
 
     def on_run(self) -> None:
         """
         Callback to run code from the editor.
+
+        The code is run in a background thread so that the resource chart can be
+        updated while the run is in progress. Only one run can be in progress at a time.
+        If the execution daemon is running, the code is run there instead of in this
+        process.
+
+        If the trace_file_path setting is set, the run is traced and the trace is
+        exported to that file once the output is rendered.
+
+        If the profile's syntax precheck is known to fail for the code without spawning
+        a process (see quick_precheck), the run fails fast with the precheck output.
+
+        If the heat map is enabled, the code is run with a line profiler and the editor
+        shows the per-line statistics afterwards.
+
+        If session mode is enabled, the code is run cell by cell in the profile's
+        persistent session instead (see Session.run), without the daemon or the heat
+        map.
+
+        Unless the performance_history setting is off, the timings of runs are recorded
+        in the performance history. Line profiled and session runs aren't recorded,
+        since their timings aren't comparable to plain runs.
         """
-        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
-        editor_text = current_editor.text()
-        current_language_profile = self._languages_combo_box.currentData()
+        if self._run_worker is not None:
+            return
+        self._trace_file_path = self._get_trace_file_path()
+        set_tracing_enabled(bool(self._trace_file_path))
+        with span("profile lookup"):
+            current_language_profile = self._languages_combo_box.currentData()
         if current_language_profile is None:
             pop_up_error_message("no language profile loaded")
             return
-        try:
-            stdout, stderr = get_output(current_language_profile, editor_text)
-        except Exception as e:
-            pop_up_error_message(e)
-            return
-        self._output_widget.setText("")
-        if not stderr and not stdout:
-            text_color_hex = QColor(Qt.GlobalColor.darkGray).name(
-                QColor.NameFormat.HexArgb
+        # The span is only started once the run is certain to happen, since it's only
+        # finished when the run is.
+        run_span = span("on_run", profile=current_language_profile.name)
+        self._run_span = run_span
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        editor_text = current_editor.text()
+        sample_interval = self._get_sample_interval()
+        self._resource_chart.clear()
+
+        precheck_enabled = self._is_precheck_enabled()
+        profile_lines = self._heat_map_button.isChecked()
+        session = None
+        if self._session_button.isChecked():
+            session = self._get_session(current_language_profile)
+        self._run_editor = current_editor
+        self._run_history_request = None
+        if self._is_history_enabled() and not profile_lines:
+            self._run_history_request = (current_language_profile, editor_text)
+
+        def run_code(on_sample: Callable[[ResourceSample], None]) -> RunResult:
+            if precheck_enabled:
+                precheck_result = quick_precheck(current_language_profile, editor_text)
+                if precheck_result is not None and precheck_result.failed:
+                    return RunResult("", precheck_result.output)
+            if session is not None:
+                return session.run(editor_text, sample_interval, on_sample)
+            result = get_output_via_daemon(
+                current_language_profile,
+                editor_text,
+                sample_interval,
+                on_sample,
+                profile_lines,
             )
-            html = f'<span style="color:{text_color_hex}"><em>no output</em></span>'
-            self._output_widget.setHtml(html)
-        if stderr:
-            original_text_color = self._output_widget.palette().color(
-                QPalette.ColorRole.Text
+            if result is None:
+                result = get_output(
+                    current_language_profile,
+                    editor_text,
+                    sample_interval,
+                    on_sample,
+                    profile_lines,
+                )
+            return result
+
+        self._run_worker = Worker(run_code)
+        self._run_worker.progress.connect(self._resource_chart.add_sample)
+        self._run_worker.succeeded.connect(self._on_run_succeeded)
+        self._run_worker.failed.connect(self._on_run_failed)
+        self._run_worker.finished.connect(self._on_run_finished)
+        self._run_button.setEnabled(False)
+        self._run_worker.start()
+
+    def _on_run_succeeded(self, result: RunResult) -> None:
+        """
+        Display the results of a completed run.
+        """
+        with span("output rendering"):
+            self._show_run_result(result)
+        # The language may have been switched during the run, and the editor that ran
+        # may have been freed since.
+        if self._run_editor is not None and self._run_editor in self._editors.values():
+            self._run_editor.set_line_stats(result.line_stats)
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        if self._run_history_request is not None and result.timings is not None:
+            self._record_run_history(*self._run_history_request, result.timings)
+        if self._is_precheck_enabled():
+            precheck_result = lookup_precheck(
+                self._languages_combo_box.currentData(), current_editor.text()
             )
-            self._output_widget.setTextColor(Qt.GlobalColor.red)
-            self._output_widget.append(stderr)
-            self._output_widget.setTextColor(original_text_color)
+            if precheck_result is not None:
+                current_editor.set_diagnostics(precheck_result.diagnostics)
+
+    def _show_run_result(self, result: RunResult) -> None:
+        """
+        Render the output and resource timeline of a run.
+        """
+        stdout, stderr = result.stdout, result.stderr
+        self._resource_chart.set_samples(result.samples)
+        self._output_widget.clear()
+        if not stderr and not stdout:
+            self._output_widget.show_placeholder("no output")
+        if stderr:
+            self._output_widget.append_output(stderr, QColor(Qt.GlobalColor.red))
         if stdout:
-            self._output_widget.append(stdout)
+            self._output_widget.append_output(stdout)
         scrollbar = self._output_widget.verticalScrollBar()
         scrollbar.setValue(scrollbar.minimum())
+        if self._output_search_bar.isVisible():
+            self._output_search_bar.search()
+
+    def _on_run_failed(self, e: Exception) -> None:
+        """
+        Report an error that prevented a run from completing.
+        """
+        pop_up_error_message(e)
+
+    def _on_run_finished(self) -> None:
+        """
+        Clean up after a run, whether or not it succeeded.
+        """
+        if self._run_worker is not None:
+            # finished is emitted just before the thread returns; let it return before
+            # dropping the last reference to it.
+            self._run_worker.wait()
+        self._run_worker = None
+        self._run_editor = None
+        self._run_history_request = None
+        self._run_button.setEnabled(True)
+        if self._run_span is not None:
+            self._run_span.finish()
+            self._run_span = None
+        if self._trace_file_path:
+            try:
+                export_trace(self._trace_file_path)
+            except OSError as e:
+                cast(QStatusBar, self.statusBar()).showMessage(
+                    f"failed to export trace: {e}"
+                )
+
+    def on_codegen_toggled(self, checked: bool) -> None:
+        """
+        Callback to show or hide the generated code panel.
+        """
+        self._codegen_panel.setVisible(checked)
+        if checked:
+            self._update_codegen_panel()
+
+    def on_heat_map_toggled(self, checked: bool) -> None:
+        """
+        Callback to turn line profiling of runs on or off.
+
+        Turning it off hides the current heat map.
+        """
+        if not checked:
+            current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+            current_editor.set_line_stats({})
+
+    def on_history_toggled(self, checked: bool) -> None:
+        """
+        Callback to show or hide the performance history panel.
+        """
+        self._history_panel.setVisible(checked)
+        if checked:
+            self._history_panel.refresh()
+
+    def on_session_toggled(self, checked: bool) -> None:
+        """
+        Callback to turn session mode on or off.
+
+        Turning it off stops all sessions, so that turning it on again starts from
+        scratch.
+        """
+        self._restart_session_button.setEnabled(checked)
+        if not checked:
+            for session in self._sessions.values():
+                session.restart()
+
+    def on_restart_session(self) -> None:
+        """
+        Callback to stop the session of the current profile and forget its state.
+
+        This also interrupts a cell that is still running.
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        if current_language_profile is None:
+            return
+        session = self._sessions.get(current_language_profile.name)
+        if session is not None:
+            session.restart()
+            cast(QStatusBar, self.statusBar()).showMessage("session restarted")
 
     def on_settings_click(self) -> None:
         """
         Handles settings button click.
         """
         new_font, _ = QFontDialog.getFont(self._output_widget.font())
-        for i in range(self._editors_layout.count()):
-            editor: Editor = cast(Editor, self._editors_layout.widget(i))
+        for editor in self._editors.values():
             editor.setFont(new_font)
             lexer = editor.lexer()
             if lexer is not None:
                 lexer.setFont(new_font)
+        for lexers in self._lexer_pool.values():
+            for lexer in lexers:
+                lexer.setFont(new_font)
         self._output_widget.setFont(new_font)
+        self._codegen_panel.setFont(new_font)
 
     def switch_editor(self) -> None:
         """
         Switches to the editor instance pointed to by the languages combobox.
+
+        Only a limited number of editors are kept alive (see _evict_editors), so the
+        editor may have to be rebuilt from its saved state.
         """
         self._output_widget.clear()
+        self._resource_chart.clear()
+        cast(QStatusBar, self.statusBar()).clearMessage()
+        if self._output_search_bar.isVisible():
+            self._output_search_bar.search()
         language_index = self._languages_combo_box.currentIndex()
-        editor_index = self._editor_index_map.get(language_index)
-        if editor_index is None:
-            editor_index = len(self._editor_index_map)
-            self._editor_index_map[language_index] = editor_index
-        if editor_index < self._editors_layout.count():
-            self._editors_layout.setCurrentIndex(editor_index)
-            return
-        editor = Editor()
-        editor.setFont(self._output_widget.font())
-        self._editors_layout.addWidget(editor)
-        self._editors_layout.setCurrentIndex(editor_index)
-        self._set_editor_lexer()
-        self._restore_editor_text()
+        editor = self._editors.get(language_index)
+        if editor is not None:
+            self._editors_layout.setCurrentWidget(editor)
+        else:
+            editor = Editor()
+            editor.setFont(self._output_widget.font())
+            language_profile: LanguageProfile | None = (
+                self._languages_combo_box.currentData()
+            )
+            editor.set_diagnostics_margin_visible(
+                language_profile is not None
+                and language_profile.has_precheck
+                and self._is_precheck_enabled()
+            )
+            self._editors[language_index] = editor
+            self._editors_layout.addWidget(editor)
+            self._editors_layout.setCurrentWidget(editor)
+            self._set_editor_lexer()
+            self._restore_editor_text()
+            editor.textChanged.connect(self._typing_pause_timer.start)
+            editor.cursorPositionChanged.connect(self._on_editor_cursor_moved)
+        self._editors.move_to_end(language_index)
+        self._evict_editors()
+        self._reset_codegen_panel()
+        self._reset_heat_map_button()
+        self._reset_session_button()
+        self._reset_history_panel()
+
+    def _evict_editors(self) -> None:
+        """
+        Free the least recently used editors beyond the max_live_editors setting
+        (default 4).
+
+        The state of each freed editor is saved so that it can be rebuilt later, and its
+        lexer is kept for reuse by the next editor of the same language.
+        """
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        max_live_editors = max(int(settings.value("max_live_editors", 4)), 1)
+        settings.endGroup()
+        while len(self._editors) > max_live_editors:
+            language_index, editor = self._editors.popitem(last=False)
+            self._editor_states[language_index] = editor.save_state()
+            lexer = editor.lexer()
+            if lexer is not None:
+                editor.setLexer(None)
+                language_profile: LanguageProfile = self._languages_combo_box.itemData(
+                    language_index
+                )
+                self._lexer_pool.setdefault(language_profile.language_id, []).append(
+                    lexer
+                )
+            self._editors_layout.removeWidget(editor)
+            editor.deleteLater()
 
     def _make_main_splitter(self) -> QSplitter:
         """
@@ -177,20 +478,31 @@ class MainWindow(QMainWindow):
         top_row_layout.addWidget(self._languages_combo_box)
         top_row_layout.addWidget(self._run_button)
         top_row_layout.addWidget(self._settings_button)
+        top_row_layout.addWidget(self._codegen_button)
+        top_row_layout.addWidget(self._heat_map_button)
+        top_row_layout.addWidget(self._session_button)
+        top_row_layout.addWidget(self._restart_session_button)
+        top_row_layout.addWidget(self._history_button)
         top_row_layout.addWidget(top_row_spacer)
         top_row_container = QWidget()
         top_row_container.setLayout(top_row_layout)
         editors_container = QWidget()
         editors_container.setLayout(self._editors_layout)
+        editors_splitter = UniformSplitter(Qt.Orientation.Horizontal)
+        editors_splitter.addWidget(editors_container)
+        editors_splitter.addWidget(self._codegen_panel)
         splitter_top_layout = QVBoxLayout()
         splitter_top_layout.setContentsMargins(QMargins())
         splitter_top_layout.addWidget(top_row_container)
-        splitter_top_layout.addWidget(editors_container)
+        splitter_top_layout.addWidget(editors_splitter, 1)
         splitter_top_container = QWidget()
         splitter_top_container.setLayout(splitter_top_layout)
         splitter_bottom_layout = QVBoxLayout()
         splitter_bottom_layout.setContentsMargins(QMargins())
+        splitter_bottom_layout.addWidget(self._output_search_bar)
         splitter_bottom_layout.addWidget(self._output_widget)
+        splitter_bottom_layout.addWidget(self._resource_chart)
+        splitter_bottom_layout.addWidget(self._history_panel)
         splitter_bottom_container = QWidget()
         splitter_bottom_container.setLayout(splitter_bottom_layout)
         splitter = UniformSplitter(Qt.Orientation.Vertical)
@@ -198,6 +510,228 @@ class MainWindow(QMainWindow):
         splitter.addWidget(splitter_bottom_container)
         return splitter
 
+    def _get_sample_interval(self) -> float | None:
+        """
+        Get the interval in seconds at which to sample resource usage during a run.
+
+        The interval is read from the resource_sample_interval_ms setting, defaulting to
+        100 ms. A value of 0 or less disables sampling.
+        """
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        interval_ms = int(settings.value("resource_sample_interval_ms", 100))
+        settings.endGroup()
+        if interval_ms <= 0:
+            return None
+        return interval_ms / 1000
+
+    def _get_trace_file_path(self) -> str:
+        """
+        Get the path of the file that run traces are exported to.
+
+        The path is read from the trace_file_path debug setting. Tracing is off if the
+        setting is empty or unset.
+        """
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        trace_file_path = str(settings.value("trace_file_path", ""))
+        settings.endGroup()
+        return trace_file_path
+
+    def _on_codegen_line_selected(self, source_line: int) -> None:
+        """
+        Highlight the source line that the selected line of generated code came from.
+        """
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        current_editor.set_highlighted_lines([source_line] if source_line >= 0 else [])
+
+    def _on_typing_paused(self) -> None:
+        """
+        Start the work that happens in the background after typing pauses.
+        """
+        self._update_codegen_panel()
+        self._start_precheck()
+        self._start_speculative_build()
+
+    def _is_precheck_enabled(self) -> bool:
+        """
+        Return whether syntax prechecks are enabled by the syntax_precheck setting
+        (enabled by default).
+        """
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        precheck_enabled = settings.value("syntax_precheck", True, type=bool)
+        settings.endGroup()
+        return precheck_enabled
+
+    def _is_history_enabled(self) -> bool:
+        """
+        Return whether run timings are recorded in the performance history, according
+        to the performance_history setting (enabled by default).
+        """
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        history_enabled = settings.value("performance_history", True, type=bool)
+        settings.endGroup()
+        return history_enabled
+
+    def _record_run_history(
+        self, language_profile: LanguageProfile, code: str, timings: RunTimings
+    ) -> None:
+        """
+        Record the timings of a run in the performance history, and report in the
+        status bar if the code is significantly slower than the profile's baseline.
+        """
+        status_bar = cast(QStatusBar, self.statusBar())
+        try:
+            history = get_performance_history()
+            history.record_run(language_profile.name, code, timings)
+            regression_check = history.check_regression(
+                language_profile.name, code, self._history_panel.regression_threshold
+            )
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            status_bar.showMessage(f"failed to record performance history: {e}")
+            return
+        if regression_check is not None and regression_check.regressed:
+            status_bar.showMessage(
+                f"r{regression_check.revision} is {regression_check.change:.0%} slower"
+                f" than baseline r{regression_check.baseline_revision}"
+            )
+        self._history_panel.set_code(code)
+        if self._history_panel.isVisible():
+            self._history_panel.refresh()
+
+    def _start_precheck(self) -> None:
+        """
+        Check the current editor's code for syntax errors in the background and mark
+        them in the editor.
+
+        Prechecks run at low priority.
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        if (
+            current_language_profile is None
+            or not current_language_profile.has_precheck
+            or not self._is_precheck_enabled()
+            or self._precheck_worker is not None
+        ):
+            return
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        editor_text = current_editor.text()
+        precheck_request = (current_language_profile, editor_text)
+        if precheck_request == self._last_precheck_request:
+            return
+        self._last_precheck_request = precheck_request
+        cached_result = lookup_precheck(current_language_profile, editor_text)
+        if cached_result is not None:
+            current_editor.set_diagnostics(cached_result.diagnostics)
+            return
+        self._precheck_worker = Worker(
+            lambda _: precheck(
+                current_language_profile, editor_text, Priority.BACKGROUND
+            )
+        )
+        self._precheck_worker.succeeded.connect(
+            lambda result: self._on_precheck_succeeded(result, precheck_request)
+        )
+        self._precheck_worker.finished.connect(self._on_precheck_finished)
+        self._precheck_worker.start()
+
+    def _on_precheck_succeeded(
+        self,
+        result: PrecheckResult,
+        precheck_request: tuple[LanguageProfile, str],
+    ) -> None:
+        """
+        Mark the diagnostics of a background precheck if the code hasn't changed since.
+        """
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        if precheck_request == (
+            self._languages_combo_box.currentData(),
+            current_editor.text(),
+        ):
+            current_editor.set_diagnostics(result.diagnostics)
+
+    def _on_precheck_finished(self) -> None:
+        """
+        Clean up after a background precheck and catch up with any edits made during it.
+        """
+        if self._precheck_worker is not None:
+            self._precheck_worker.wait()
+        self._precheck_worker = None
+        if not self._typing_pause_timer.isActive():
+            self._start_precheck()
+
+    def _start_speculative_build(self) -> None:
+        """
+        Compile the current editor's code in the background at low priority.
+
+        The compiled program is cached, so a later run of the same code skips the
+        compilation step. Compile errors are shown in the status bar. This is controlled
+        by the speculative_compile setting (enabled by default).
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        if current_language_profile is None or not current_language_profile.compile:
+            return
+        settings = QSettings()
+        settings.beginGroup("main_window")
+        speculative_compile = settings.value("speculative_compile", True, type=bool)
+        settings.endGroup()
+        if not speculative_compile or self._build_worker is not None:
+            return
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        editor_text = current_editor.text()
+        build_request = (current_language_profile, editor_text)
+        if build_request == self._last_build_request:
+            return
+        self._last_build_request = build_request
+        if lookup_build(current_language_profile, editor_text) is not None:
+            return
+        self._build_worker = Worker(
+            lambda _: build(current_language_profile, editor_text, Priority.BACKGROUND)
+        )
+        self._build_worker.succeeded.connect(self._on_speculative_build_succeeded)
+        self._build_worker.finished.connect(self._on_speculative_build_finished)
+        self._build_worker.start()
+
+    def _on_speculative_build_succeeded(self, result: BuildResult) -> None:
+        """
+        Surface compile errors found by a speculative build.
+        """
+        status_bar = cast(QStatusBar, self.statusBar())
+        if result.executable_path is not None:
+            status_bar.clearMessage()
+            status_bar.setToolTip("")
+            return
+        compiler_output = (result.stderr + result.stdout).strip()
+        first_error_line = next(
+            (line for line in compiler_output.splitlines() if "error" in line),
+            "compilation failed",
+        )
+        status_bar.showMessage(first_error_line)
+        status_bar.setToolTip(compiler_output)
+
+    def _on_speculative_build_finished(self) -> None:
+        """
+        Clean up after a speculative build and catch up with any edits made during it.
+        """
+        if self._build_worker is not None:
+            self._build_worker.wait()
+        self._build_worker = None
+        if not self._typing_pause_timer.isActive():
+            self._start_speculative_build()
+
+    def _on_editor_cursor_moved(self, line: int, index: int) -> None:
+        """
+        Highlight the generated code for the source line under the editor cursor.
+        """
+        if self._codegen_button.isChecked():
+            self._codegen_panel.highlight_source_line(line)
+
     def _populate_languages_combobox(self) -> None:
         """
         Add all language profiles to the languages combobox.
@@ -213,7 +747,17 @@ class MainWindow(QMainWindow):
     def _restore_editor_text(self) -> None:
         """
         Restore any saved editor text for the current language profile.
+
+        If the editor was freed earlier in this session, its full state is restored;
+        otherwise the text saved by the previous session is restored.
         """
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        editor_state = self._editor_states.pop(
+            self._languages_combo_box.currentIndex(), None
+        )
+        if editor_state is not None:
+            current_editor.restore_state(editor_state)
+            return
         settings = QSettings()
         settings.beginGroup("main_window")
         settings.beginGroup("editor_text")
@@ -223,7 +767,6 @@ class MainWindow(QMainWindow):
         if current_language_profile is not None and settings.contains(
             current_language_profile.name
         ):
-            current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
             current_editor.setText(settings.value(current_language_profile.name))
         settings.endGroup()
         settings.endGroup()
@@ -235,6 +778,11 @@ class MainWindow(QMainWindow):
 
         Note that not everything saved by _save_window_state is restored here; saved
         code from editors is not restored until the respective editor is loaded.
+
+        This also applies the max_concurrent_processes setting to the process scheduler
+        (default 0, which means the number of CPU cores), and the
+        regression_threshold_percent setting to the performance history panel (default
+        10).
         """
         settings = QSettings()
         settings.beginGroup("main_window")
@@ -262,6 +810,12 @@ class MainWindow(QMainWindow):
             self._output_widget.setFont(saved_font)
         else:
             self._output_widget.setFont(QFont("Consolas", 11))
+        get_scheduler().max_concurrency = int(
+            settings.value("max_concurrent_processes", 0)
+        )
+        self._history_panel.regression_threshold = (
+            float(settings.value("regression_threshold_percent", 10)) / 100
+        )
         settings.endGroup()
 
     def _save_window_state(self) -> None:
@@ -280,24 +834,110 @@ class MainWindow(QMainWindow):
         settings.setValue("font", self._output_widget.font().toString())
         settings.beginGroup("editor_text")
         for language_index in range(self._languages_combo_box.count()):
-            if language_index not in self._editor_index_map:
-                continue
             language_profile: LanguageProfile = self._languages_combo_box.itemData(
                 language_index
             )
-            editor: Editor = cast(
-                Editor,
-                self._editors_layout.widget(self._editor_index_map[language_index]),
-            )
-            settings.setValue(language_profile.name, editor.text())
+            if language_index in self._editors:
+                settings.setValue(
+                    language_profile.name, self._editors[language_index].text()
+                )
+            elif language_index in self._editor_states:
+                settings.setValue(
+                    language_profile.name, self._editor_states[language_index].text
+                )
         settings.endGroup()
         settings.endGroup()
 
+    def _reset_codegen_panel(self) -> None:
+        """
+        Point the generated code panel at the current language profile.
+
+        The panel is only available for profiles that define codegen views.
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        has_codegen_views = current_language_profile is not None and bool(
+            current_language_profile.codegen_views
+        )
+        self._codegen_panel.set_language_profile(current_language_profile)
+        self._codegen_button.setEnabled(has_codegen_views)
+        if not has_codegen_views:
+            self._codegen_button.setChecked(False)
+        elif self._codegen_button.isChecked():
+            self._update_codegen_panel()
+
+    def _reset_heat_map_button(self) -> None:
+        """
+        Enable the heat map button only for profiles that support line profiling.
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        has_line_profile = (
+            current_language_profile is not None
+            and current_language_profile.line_profile_builtin is not None
+        )
+        self._heat_map_button.setEnabled(has_line_profile)
+        if not has_line_profile:
+            self._heat_map_button.setChecked(False)
+
+    def _reset_session_button(self) -> None:
+        """
+        Enable the session button only for profiles that support sessions.
+
+        Session mode stays on across profiles that support it; each profile has its own
+        session.
+        """
+        current_language_profile: LanguageProfile | None = (
+            self._languages_combo_box.currentData()
+        )
+        has_session = (
+            current_language_profile is not None
+            and current_language_profile.session_builtin is not None
+        )
+        self._session_button.setEnabled(has_session)
+        if not has_session:
+            self._session_button.setChecked(False)
+
+    def _reset_history_panel(self) -> None:
+        """
+        Show the performance history of the current profile, with the editor's code as
+        the current revision.
+        """
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        self._history_panel.set_language_profile(
+            self._languages_combo_box.currentData()
+        )
+        self._history_panel.set_code(current_editor.text())
+        if self._history_panel.isVisible():
+            self._history_panel.refresh()
+
+    def _get_session(self, language_profile: LanguageProfile) -> Session:
+        """
+        Return the session of the given profile, creating it if needed.
+        """
+        session = self._sessions.get(language_profile.name)
+        if session is None:
+            session = Session(language_profile)
+            self._sessions[language_profile.name] = session
+        return session
+
+    def _update_codegen_panel(self) -> None:
+        """
+        Update the generated code panel with the current editor's code.
+        """
+        if not self._codegen_button.isChecked():
+            return
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        self._codegen_panel.set_code(current_editor.text())
+
     def _set_editor_lexer(self) -> None:
         """
         Set lexer for the current editor.
 
-        This only needs to be done once per editor widget instance.
+        This only needs to be done once per editor widget instance. Lexers left over
+        from freed editors of the same language are reused when available.
 
         Note that currently the background colors of the themes are ignored; only the
         foreground colors are used. The background colors come from the window palette.
@@ -307,6 +947,11 @@ class MainWindow(QMainWindow):
         )
         if current_language_profile is None:
             return
+        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
+        pooled_lexers = self._lexer_pool.get(current_language_profile.language_id)
+        if pooled_lexers:
+            current_editor.setLexer(pooled_lexers.pop())
+            return
         try:
             lexer_color_map = self._theme.get_lexer_color_map(
                 current_language_profile.language_id
@@ -323,7 +968,6 @@ class MainWindow(QMainWindow):
         lexer.setFont(self._output_widget.font())
         for style_id, color_hex in lexer_color_map.items():
             lexer.setColor(QColor(color_hex), style_id)
-        current_editor: Editor = cast(Editor, self._editors_layout.currentWidget())
         current_editor.setLexer(lexer)
 
 
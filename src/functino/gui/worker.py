@@ -0,0 +1,39 @@
+from typing import Any, Callable
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class Worker(QThread):
+    """
+    Thread that runs a single function in the background.
+
+    The function is passed a progress callback as its only argument; any object passed
+    to the callback is emitted with the progress signal. When the function finishes,
+    either succeeded is emitted with its return value or failed is emitted with the
+    exception it raised.
+
+    All signals are delivered to the thread that created the worker, so it's safe to
+    touch widgets from connected slots.
+
+    The finished signal is emitted just before the thread returns, so a slot connected
+    to it must call wait before dropping the last reference to the worker.
+    """
+
+    progress = pyqtSignal(object)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(Exception)
+
+    def __init__(self, function: Callable[[Callable[[Any], None]], Any]) -> None:
+        super().__init__()
+        self._function = function
+
+    def run(self) -> None:
+        """
+        Reimplementation of run that calls the function and emits the result.
+        """
+        try:
+            result = self._function(self.progress.emit)
+        except Exception as e:
+            self.failed.emit(e)
+            return
+        self.succeeded.emit(result)
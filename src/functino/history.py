@@ -0,0 +1,381 @@
+from hashlib import sha256
+import os
+from pathlib import Path
+import sqlite3
+from statistics import median
+import threading
+import time
+
+from functino.execute import RunTimings
+from functino.platform_path import get_user_data_path
+from functino.trace import span
+
+
+class HistoryEntry:
+    """
+    The timings of one recorded run of a snippet.
+    """
+
+    def __init__(
+        self, snippet_hash: str, revision: int, timestamp: float, timings: RunTimings
+    ) -> None:
+        self._snippet_hash = snippet_hash
+        self._revision = revision
+        self._timestamp = timestamp
+        self._timings = timings
+
+    @property
+    def snippet_hash(self) -> str:
+        """
+        The content hash of the code that ran (see get_snippet_hash).
+        """
+        return self._snippet_hash
+
+    @property
+    def revision(self) -> int:
+        """
+        The revision number of the code, counting distinct snippets that ran with the
+        profile from 1.
+        """
+        return self._revision
+
+    @property
+    def timestamp(self) -> float:
+        """
+        When the run finished, in seconds since the epoch.
+        """
+        return self._timestamp
+
+    @property
+    def timings(self) -> RunTimings:
+        """
+        The timings of the run.
+        """
+        return self._timings
+
+
+class RegressionCheck:
+    """
+    Comparison of the run times of a revision with the run times of the baseline.
+    """
+
+    def __init__(
+        self,
+        revision: int,
+        baseline_revision: int,
+        run_time: float,
+        baseline_run_time: float,
+        regressed: bool,
+    ) -> None:
+        self._revision = revision
+        self._baseline_revision = baseline_revision
+        self._run_time = run_time
+        self._baseline_run_time = baseline_run_time
+        self._regressed = regressed
+
+    @property
+    def revision(self) -> int:
+        """
+        The revision number that was checked.
+        """
+        return self._revision
+
+    @property
+    def baseline_revision(self) -> int:
+        """
+        The revision number of the baseline.
+        """
+        return self._baseline_revision
+
+    @property
+    def run_time(self) -> float:
+        """
+        The median run time in seconds of the checked revision.
+        """
+        return self._run_time
+
+    @property
+    def baseline_run_time(self) -> float:
+        """
+        The median run time in seconds of the baseline.
+        """
+        return self._baseline_run_time
+
+    @property
+    def change(self) -> float:
+        """
+        The relative change of the median run time (e.g. 0.25 for 25% slower).
+        """
+        return self._run_time / max(self._baseline_run_time, 1e-9) - 1
+
+    @property
+    def regressed(self) -> bool:
+        """
+        Whether the checked revision is significantly slower than the baseline.
+        """
+        return self._regressed
+
+
+# The number of most recent runs per profile that are kept.
+_MAX_RUNS_PER_PROFILE = 5000
+# The number of most recent runs of a revision that regression checks look at.
+_REGRESSION_CHECK_RUNS = 20
+# Slowdowns smaller than this many seconds are never regressions, since they are
+# within the noise of process startup.
+_MIN_REGRESSION_SECONDS = 0.005
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    id INTEGER PRIMARY KEY,
+    profile TEXT NOT NULL,
+    snippet_hash TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    UNIQUE (profile, snippet_hash)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    revision_id INTEGER NOT NULL REFERENCES revisions (id),
+    timestamp REAL NOT NULL,
+    compile_time REAL,
+    run_time REAL NOT NULL,
+    cpu_time REAL,
+    peak_rss_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_revision_id ON runs (revision_id);
+CREATE TABLE IF NOT EXISTS baselines (
+    profile TEXT PRIMARY KEY,
+    revision_id INTEGER NOT NULL REFERENCES revisions (id)
+);
+"""
+
+
+class PerformanceHistory:
+    """
+    Local database of the timings of past runs, per snippet revision and profile.
+
+    A snippet revision is identified by the content hash of its code, so the code
+    itself is never stored. Each profile can have one revision pinned as its baseline,
+    which new revisions are checked against for regressions.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(self, database_path: Path | str) -> None:
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        with self._lock:
+            # Write-ahead logging keeps the commit of each run cheap and lets several
+            # Functino processes share the database.
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def record_run(
+        self,
+        profile_name: str,
+        code: str,
+        timings: RunTimings,
+        timestamp: float | None = None,
+    ) -> None:
+        """
+        Record the timings of a run of the given code.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with span("history record"), self._lock, self._connection:
+            revision_id = self._get_revision_id(profile_name, get_snippet_hash(code))
+            self._connection.execute(
+                "INSERT INTO runs (revision_id, timestamp, compile_time, run_time,"
+                " cpu_time, peak_rss_bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    revision_id,
+                    timestamp,
+                    timings.compile_time,
+                    timings.run_time,
+                    timings.cpu_time,
+                    timings.peak_rss_bytes,
+                ),
+            )
+            self._connection.execute(
+                "DELETE FROM runs WHERE id IN (SELECT runs.id FROM runs JOIN revisions"
+                " ON runs.revision_id = revisions.id WHERE revisions.profile = ?"
+                " ORDER BY runs.id DESC LIMIT -1 OFFSET ?)",
+                (profile_name, _MAX_RUNS_PER_PROFILE),
+            )
+
+    def get_runs(self, profile_name: str, limit: int = 200) -> tuple[HistoryEntry, ...]:
+        """
+        Return the most recent runs of the given profile, oldest first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT snippet_hash, number, timestamp, compile_time, run_time,"
+                " cpu_time, peak_rss_bytes FROM runs JOIN revisions"
+                " ON runs.revision_id = revisions.id WHERE profile = ?"
+                " ORDER BY runs.id DESC LIMIT ?",
+                (profile_name, limit),
+            ).fetchall()
+        return tuple(
+            HistoryEntry(snippet_hash, revision, timestamp, RunTimings(*timings))
+            for snippet_hash, revision, timestamp, *timings in reversed(rows)
+        )
+
+    def get_revision(self, profile_name: str, code: str) -> int | None:
+        """
+        Return the revision number of the given code, or None if it never ran.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT number FROM revisions WHERE profile = ? AND snippet_hash = ?",
+                (profile_name, get_snippet_hash(code)),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def get_baseline(self, profile_name: str) -> int | None:
+        """
+        Return the revision number of the profile's baseline, or None if none is
+        pinned.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT number FROM baselines JOIN revisions"
+                " ON baselines.revision_id = revisions.id"
+                " WHERE baselines.profile = ?",
+                (profile_name,),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def pin_baseline(self, profile_name: str, code: str) -> None:
+        """
+        Pin the revision of the given code as the profile's baseline.
+        """
+        with self._lock, self._connection:
+            revision_id = self._get_revision_id(profile_name, get_snippet_hash(code))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO baselines (profile, revision_id) VALUES (?, ?)",
+                (profile_name, revision_id),
+            )
+
+    def unpin_baseline(self, profile_name: str) -> None:
+        """
+        Remove the profile's baseline.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM baselines WHERE profile = ?", (profile_name,)
+            )
+
+    def check_regression(
+        self, profile_name: str, code: str, threshold: float
+    ) -> RegressionCheck | None:
+        """
+        Compare the run times of the given code with those of the profile's baseline.
+
+        The code regressed if the median of its recent run times is more than threshold
+        (e.g. 0.1 for 10%) slower than the baseline's median, and even its fastest
+        recent run is slower than the baseline's median, so that a single noisy run
+        isn't flagged. Returns None if there is no baseline or either revision has no
+        runs.
+        """
+        with self._lock:
+            revision_row = self._connection.execute(
+                "SELECT id, number FROM revisions"
+                " WHERE profile = ? AND snippet_hash = ?",
+                (profile_name, get_snippet_hash(code)),
+            ).fetchone()
+            baseline_row = self._connection.execute(
+                "SELECT revisions.id, number FROM baselines JOIN revisions"
+                " ON baselines.revision_id = revisions.id"
+                " WHERE baselines.profile = ?",
+                (profile_name,),
+            ).fetchone()
+            if revision_row is None or baseline_row is None:
+                return None
+            run_times = self._get_recent_run_times(revision_row[0])
+            baseline_run_times = self._get_recent_run_times(baseline_row[0])
+        if not run_times or not baseline_run_times:
+            return None
+        run_time = median(run_times)
+        baseline_run_time = median(baseline_run_times)
+        regressed = (
+            run_time > baseline_run_time * (1 + threshold)
+            and run_time - baseline_run_time > _MIN_REGRESSION_SECONDS
+            and min(run_times) > baseline_run_time
+        )
+        return RegressionCheck(
+            revision_row[1], baseline_row[1], run_time, baseline_run_time, regressed
+        )
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _get_revision_id(self, profile_name: str, snippet_hash: str) -> int:
+        """
+        Return the row ID of the given revision, adding it if it's new.
+
+        Must be called with the lock held.
+        """
+        row = self._connection.execute(
+            "SELECT id FROM revisions WHERE profile = ? AND snippet_hash = ?",
+            (profile_name, snippet_hash),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        cursor = self._connection.execute(
+            "INSERT INTO revisions (profile, snippet_hash, number)"
+            " SELECT ?, ?, COALESCE(MAX(number), 0) + 1 FROM revisions"
+            " WHERE profile = ?",
+            (profile_name, snippet_hash, profile_name),
+        )
+        assert cursor.lastrowid is not None
+        return cursor.lastrowid
+
+    def _get_recent_run_times(self, revision_id: int) -> list[float]:
+        """
+        Return the run times of the most recent runs of the given revision.
+
+        Must be called with the lock held.
+        """
+        return [
+            run_time
+            for (run_time,) in self._connection.execute(
+                "SELECT run_time FROM runs WHERE revision_id = ? ORDER BY id DESC"
+                " LIMIT ?",
+                (revision_id, _REGRESSION_CHECK_RUNS),
+            )
+        ]
+
+
+def get_snippet_hash(code: str) -> str:
+    """
+    Return the content hash that identifies a revision of a snippet.
+    """
+    return sha256(code.encode()).hexdigest()
+
+
+_performance_history: PerformanceHistory | None = None
+_performance_history_lock = threading.Lock()
+
+
+def get_performance_history() -> PerformanceHistory:
+    """
+    Return the performance history shared by everything in this process, opening the
+    database in the user data directory on first use.
+    """
+    global _performance_history
+    with _performance_history_lock:
+        if _performance_history is None:
+            database_path = get_history_database_path()
+            os.makedirs(database_path.parent, mode=0o755, exist_ok=True)
+            _performance_history = PerformanceHistory(database_path)
+        return _performance_history
+
+
+def get_history_database_path() -> Path:
+    """
+    Get path of the performance history database.
+    """
+    return get_user_data_path() / "history.sqlite3"
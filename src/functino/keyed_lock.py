@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+import threading
+from typing import Iterator
+
+
+class KeyedLock:
+    """
+    Set of locks identified by keys, e.g. the content hashes of builds.
+
+    The lock of a key only exists while it's held or waited for, so that the locks of
+    finished work don't pile up.
+    """
+
+    def __init__(self) -> None:
+        # The lock of each key in use, with its number of users.
+        self._locks: dict[str, tuple[threading.Lock, int]] = {}
+        self._locks_lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """
+        Hold the lock of the given key, waiting for other holders first.
+        """
+        with self._locks_lock:
+            lock, user_count = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, user_count + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._locks_lock:
+                lock, user_count = self._locks[key]
+                if user_count == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, user_count - 1)
@@ -8,6 +8,7 @@ from typing import Any
 
 from functino.platform_path import get_user_language_profiles_path
 from functino.project_path import get_built_in_language_profiles_path
+from functino.trace import span
 
 
 class LanguageProfile:
@@ -34,6 +35,30 @@ class LanguageProfile:
         this_system = platform.system()
         if this_system in profile_data["command"]:
             self._command = tuple(profile_data["command"][this_system])
+        self._codegen_commands: dict[str, tuple[str]] = {}
+        for view_name, view_commands in profile_data.get("codegen", {}).items():
+            self._codegen_commands[view_name] = tuple(
+                view_commands.get(this_system, view_commands["default"])
+            )
+        precheck_data: dict[str, Any] = profile_data.get("precheck", {})
+        self._precheck_builtin: str | None = precheck_data.get("builtin")
+        self._precheck_command: tuple[str] | None = None
+        if "default" in precheck_data or this_system in precheck_data:
+            self._precheck_command = tuple(
+                precheck_data.get(this_system, precheck_data.get("default"))
+            )
+        self._line_profile_builtin: str | None = profile_data.get(
+            "line_profile", {}
+        ).get("builtin")
+        session_data: dict[str, Any] = profile_data.get("session", {})
+        self._session_builtin: str | None = session_data.get("builtin")
+        self._session_cell_marker: str = session_data.get("cell_marker", "")
+        crates_data: dict[str, Any] = profile_data.get("crates", {})
+        self._crates_builtin: str | None = crates_data.get("builtin")
+        self._crates_edition: str = crates_data.get("edition", "2021")
+        self._crates_vendor_path: str | None = None
+        if "vendor_path" in crates_data:
+            self._crates_vendor_path = os.path.expanduser(crates_data["vendor_path"])
 
     @property
     def name(self) -> str:
@@ -76,6 +101,155 @@ class LanguageProfile:
         """
         return self._command
 
+    @property
+    def codegen_views(self) -> tuple[str, ...]:
+        """
+        The names of the code generation views (e.g. assembly) this profile supports.
+        """
+        return tuple(self._codegen_commands)
+
+    @property
+    def has_precheck(self) -> bool:
+        """
+        Whether this profile defines a syntax precheck.
+        """
+        return self._precheck_builtin is not None or self._precheck_command is not None
+
+    @property
+    def precheck_builtin(self) -> str | None:
+        """
+        The name of the built-in syntax check (e.g. "python") used by this profile, or
+        None if the profile's precheck is a command or it has no precheck.
+        """
+        return self._precheck_builtin
+
+    @property
+    def line_profile_builtin(self) -> str | None:
+        """
+        The name of the built-in line profiler (e.g. "python") used by this profile, or
+        None if the profile doesn't support line profiling.
+        """
+        return self._line_profile_builtin
+
+    @property
+    def session_builtin(self) -> str | None:
+        """
+        The name of the built-in session kernel (e.g. "python") used to run code cell by
+        cell in a persistent interpreter, or None if the profile doesn't support
+        sessions.
+        """
+        return self._session_builtin
+
+    @property
+    def session_cell_marker(self) -> str:
+        """
+        The comment that starts a new cell in session mode (e.g. "# %%").
+        """
+        return self._session_cell_marker
+
+    @property
+    def crates_builtin(self) -> str | None:
+        """
+        The name of the built-in dependency builder (e.g. "cargo") that lets code of
+        this profile declare dependencies, or None if the profile doesn't support
+        dependencies.
+        """
+        return self._crates_builtin
+
+    @property
+    def crates_edition(self) -> str:
+        """
+        The language edition that code with dependencies is compiled with (e.g. "2021").
+        """
+        return self._crates_edition
+
+    @property
+    def crates_vendor_path(self) -> str | None:
+        """
+        The directory of vendored crate sources that dependencies are resolved from, or
+        None to resolve them from the local registry cache.
+        """
+        return self._crates_vendor_path
+
+    def generate_helper_command(
+        self, helper_script_path: str, helper_args: tuple[str, ...]
+    ) -> tuple[str, ...]:
+        """
+        Generate a command that runs one of Functino's helper scripts (e.g. the line
+        tracer) with this profile's interpreter.
+
+        The helper script takes the place of the source file in the profile's command,
+        and the helper arguments are passed right after it.
+        """
+        command = self.generate_command(helper_script_path)
+        helper_script_index = command.index(helper_script_path)
+        return (
+            *command[: helper_script_index + 1],
+            *helper_args,
+            *command[helper_script_index + 1 :],
+        )
+
+    def generate_precheck_command(
+        self, source_file_path: str, output_path: str
+    ) -> tuple[str]:
+        """
+        Generate command tuple from this profile's precheck template.
+
+        The template must contain a source file path template and may contain an output
+        path template for checks that write a file (e.g. rustc metadata).
+        """
+        if self._precheck_command is None:
+            raise RuntimeError("profile has no precheck command")
+        command_args = []
+        source_file_path_template_found = False
+        for arg in self._precheck_command:
+            if arg == r"{source_file_path}":
+                arg = arg.format(source_file_path=source_file_path)
+                source_file_path_template_found = True
+            elif arg == r"{output_path}":
+                arg = arg.format(output_path=output_path)
+            command_args.append(arg)
+        if not source_file_path_template_found:
+            raise RuntimeError(
+                "precheck command template did not contain a file path template"
+            )
+        return tuple(command_args)
+
+    def generate_codegen_command(
+        self,
+        view_name: str,
+        source_file_path: str,
+        output_path: str,
+        extra_flags: tuple[str, ...] = (),
+    ) -> tuple[str]:
+        """
+        Generate command tuple from the template of the given code generation view.
+
+        Any extra flags are inserted directly after the program name.
+        """
+        if view_name not in self._codegen_commands:
+            raise RuntimeError(f"profile has no codegen view named '{view_name}'")
+        command_args = []
+        source_file_path_template_found = False
+        output_path_template_found = False
+        for arg in self._codegen_commands[view_name]:
+            if arg == r"{source_file_path}":
+                arg = arg.format(source_file_path=source_file_path)
+                source_file_path_template_found = True
+            elif arg == r"{output_path}":
+                arg = arg.format(output_path=output_path)
+                output_path_template_found = True
+            command_args.append(arg)
+        if not source_file_path_template_found:
+            raise RuntimeError(
+                "codegen command template did not contain a file path template"
+            )
+        if not output_path_template_found:
+            raise RuntimeError(
+                "codegen command template did not contain an output path template"
+            )
+        return tuple(command_args[:1] + list(extra_flags) + command_args[1:])
+
     def generate_command(
         self, source_file_path: str, executable_path: str | None = None
     ) -> tuple[str]:
@@ -92,24 +266,27 @@ class LanguageProfile:
             raise RuntimeError(
                 "executable path must not be set for non-compile profiles"
             )
-        command_args = []
-        source_file_path_template_found = False
-        executable_path_template_found = False
-        for arg in self._command:
-            if arg == r"{source_file_path}":
-                arg = arg.format(source_file_path=source_file_path)
-                source_file_path_template_found = True
-            elif self._compile and arg == r"{executable_path}":
-                arg = arg.format(executable_path=executable_path)
-                executable_path_template_found = True
-            command_args.append(arg)
-        if not source_file_path_template_found:
-            raise RuntimeError("command template did not contain a file path template")
-        if self._compile and not executable_path_template_found:
-            raise RuntimeError(
-                "command template did not contain an executable path template"
-            )
-        return tuple(command_args)
+        with span("command expansion"):
+            command_args = []
+            source_file_path_template_found = False
+            executable_path_template_found = False
+            for arg in self._command:
+                if arg == r"{source_file_path}":
+                    arg = arg.format(source_file_path=source_file_path)
+                    source_file_path_template_found = True
+                elif self._compile and arg == r"{executable_path}":
+                    arg = arg.format(executable_path=executable_path)
+                    executable_path_template_found = True
+                command_args.append(arg)
+            if not source_file_path_template_found:
+                raise RuntimeError(
+                    "command template did not contain a file path template"
+                )
+            if self._compile and not executable_path_template_found:
+                raise RuntimeError(
+                    "command template did not contain an executable path template"
+                )
+            return tuple(command_args)
 
 
 def get_language_profiles() -> tuple[LanguageProfile]:
@@ -0,0 +1,123 @@
+from array import array
+from bisect import bisect_right
+from functools import partial
+from itertools import accumulate, islice
+from operator import itemgetter
+import re
+import threading
+
+
+class SearchResult:
+    """
+    The matches of a regex search over a line index.
+    """
+
+    def __init__(self, matches: list[tuple[int, int]], lines: list[int]) -> None:
+        self._matches = matches
+        self._lines = lines
+
+    @property
+    def matches(self) -> list[tuple[int, int]]:
+        """
+        The start and end offsets of every match, in order.
+        """
+        return self._matches
+
+    @property
+    def lines(self) -> list[int]:
+        """
+        The numbers of the lines containing at least one match, in order.
+        """
+        return self._lines
+
+
+class LineIndex:
+    """
+    Text with an index of line start offsets that is built incrementally.
+
+    Appending text only scans the new text, so the index can be kept up to date while
+    output arrives. Lines are separated by newlines only.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._length = 0
+        self._line_starts = array("q", [0])
+        self._lock = threading.Lock()
+
+    @property
+    def text(self) -> str:
+        """
+        All text appended so far.
+        """
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = ["".join(self._chunks)]
+            return self._chunks[0] if self._chunks else ""
+
+    @property
+    def line_count(self) -> int:
+        """
+        The number of lines in the text.
+        """
+        return len(self._line_starts)
+
+    def append(self, text: str) -> None:
+        """
+        Append text and index any new lines in it.
+        """
+        line_lengths = (len(line) + 1 for line in text.split("\n")[:-1])
+        line_starts = accumulate(line_lengths, initial=self._length)
+        # The first value is the start of the current last line, which is already
+        # indexed.
+        next(line_starts)
+        with self._lock:
+            self._line_starts.extend(line_starts)
+            self._chunks.append(text)
+            self._length += len(text)
+
+    def line_of(self, offset: int) -> int:
+        """
+        Return the number of the line containing the given offset.
+        """
+        return bisect_right(self._line_starts, offset) - 1
+
+    def line_start(self, line: int) -> int:
+        """
+        Return the offset of the start of the given line.
+        """
+        return self._line_starts[line]
+
+    def line_text(self, line: int) -> str:
+        """
+        Return the text of the given line without its newline.
+        """
+        start = self._line_starts[line]
+        if line + 1 < len(self._line_starts):
+            return self.text[start : self._line_starts[line + 1] - 1]
+        return self.text[start:]
+
+    def search(
+        self, pattern: re.Pattern[str], cancel_event: threading.Event | None = None
+    ) -> SearchResult | None:
+        """
+        Find all matches of the pattern and the lines they are on.
+
+        This is safe to call from a background thread while text is appended from
+        another thread; only the text present when the search started is searched.
+        Returns None if cancel_event is set before the search finishes.
+        """
+        text = self.text
+        matches: list[tuple[int, int]] = []
+        match_iterator = pattern.finditer(text)
+        while batch := [match.span() for match in islice(match_iterator, 65536)]:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            matches.extend(batch)
+        # Map each match to its line in bulk since this is the hot loop for searches
+        # with many matches.
+        match_lines = map(
+            partial(bisect_right, self._line_starts), map(itemgetter(0), matches)
+        )
+        lines = [line - 1 for line in dict.fromkeys(match_lines)]
+        return SearchResult(matches, lines)
@@ -20,3 +20,43 @@ def get_user_language_profiles_path() -> Path:
     Get path of user language profiles directory.
     """
     return get_user_config_path() / "language_profiles"
+
+
+def get_user_runtime_path() -> Path:
+    """
+    Get user runtime directory (for sockets and other transient files) for this
+    application.
+
+    Falls back to the user config directory on platforms without a runtime directory.
+    """
+    user_runtime_path_str = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.RuntimeLocation
+    )
+    if user_runtime_path_str == "":
+        return get_user_config_path()
+    return Path(user_runtime_path_str) / "functino"
+
+
+def get_user_cache_path() -> Path:
+    """
+    Get user cache directory for this application.
+    """
+    user_cache_path_str = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.CacheLocation
+    )
+    if user_cache_path_str == "":
+        raise RuntimeError("could not determine user cache path for this application")
+    return Path(user_cache_path_str)
+
+
+def get_user_data_path() -> Path:
+    """
+    Get user data directory (for persistent data that isn't configuration) for this
+    application.
+    """
+    user_data_path_str = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.AppDataLocation
+    )
+    if user_data_path_str == "":
+        raise RuntimeError("could not determine user data path for this application")
+    return Path(user_data_path_str)
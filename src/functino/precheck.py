@@ -0,0 +1,342 @@
+from collections import OrderedDict
+from hashlib import sha256
+from importlib.resources import as_file
+import json
+import os
+import platform
+import re
+from tempfile import TemporaryDirectory
+import threading
+import traceback
+import warnings
+
+from functino.crates import add_crate_args, prepare_crates
+from functino.file import write_to_tmp_file
+from functino.language import LanguageProfile
+from functino.process import run_process
+from functino.project_path import get_scripts_path
+from functino.schedule import Priority
+from functino.trace import span
+
+
+class Diagnostic:
+    """
+    An error or warning found in the source code by a precheck.
+    """
+
+    def __init__(self, line: int, column: int, severity: str, message: str) -> None:
+        self._line = line
+        self._column = column
+        self._severity = severity
+        self._message = message
+
+    @property
+    def line(self) -> int:
+        """
+        The zero-based line of the source code that the diagnostic refers to.
+        """
+        return self._line
+
+    @property
+    def column(self) -> int:
+        """
+        The zero-based column of the source code that the diagnostic refers to.
+        """
+        return self._column
+
+    @property
+    def severity(self) -> str:
+        """
+        Either "error" or "warning".
+        """
+        return self._severity
+
+    @property
+    def message(self) -> str:
+        """
+        The message describing the problem.
+        """
+        return self._message
+
+
+class PrecheckResult:
+    """
+    The result of checking code with a profile's precheck.
+    """
+
+    def __init__(self, diagnostics: tuple[Diagnostic, ...], output: str) -> None:
+        self._diagnostics = diagnostics
+        self._output = output
+
+    @property
+    def diagnostics(self) -> tuple[Diagnostic, ...]:
+        """
+        The errors and warnings found, in the order they were reported.
+        """
+        return self._diagnostics
+
+    @property
+    def output(self) -> str:
+        """
+        The full output of the check, formatted the way the toolchain reports it.
+        """
+        return self._output
+
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the check found any errors.
+        """
+        return any(diagnostic.severity == "error" for diagnostic in self._diagnostics)
+
+
+_CACHE_SIZE = 64
+_cache: OrderedDict[str, PrecheckResult] = OrderedDict()
+_cache_lock = threading.Lock()
+_interpreter_versions: dict[str, str] = {}
+# warnings.catch_warnings swaps global state, so in-process checks must not overlap.
+_compile_lock = threading.Lock()
+
+
+def precheck(
+    language_profile: LanguageProfile,
+    code: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> PrecheckResult | None:
+    """
+    Check the code for syntax errors with the profile's precheck and return the result.
+
+    Returns None if the profile has no precheck. Any process the check needs is
+    scheduled with the given priority (see run_process). Results are cached by profile
+    and source.
+    """
+    if not language_profile.has_precheck:
+        return None
+    cached_result = lookup_precheck(language_profile, code)
+    if cached_result is not None:
+        return cached_result
+    with span("precheck", profile=language_profile.name):
+        match language_profile.precheck_builtin:
+            case None:
+                result = _run_precheck_command(language_profile, code, priority)
+            case "python":
+                result = _precheck_python(language_profile, code, priority)
+            case builtin:
+                raise RuntimeError(f"unknown built-in precheck '{builtin}'")
+    cache_key = _get_cache_key(language_profile, code)
+    with _cache_lock:
+        _cache[cache_key] = result
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def lookup_precheck(
+    language_profile: LanguageProfile, code: str
+) -> PrecheckResult | None:
+    """
+    Return the cached precheck result for the given code, or None if there isn't one.
+    """
+    cache_key = _get_cache_key(language_profile, code)
+    with _cache_lock:
+        result = _cache.get(cache_key)
+        if result is not None:
+            _cache.move_to_end(cache_key)
+    return result
+
+
+def quick_precheck(
+    language_profile: LanguageProfile, code: str
+) -> PrecheckResult | None:
+    """
+    Return the precheck result for the code if it's available without spawning a
+    process, i.e. if it's cached or the profile's built-in Python check can compile the
+    code in this process.
+
+    This lets a run fail fast on errors without slowing down runs of correct code.
+    """
+    if language_profile.precheck_builtin == "python" and _is_this_interpreter(
+        _interpreter_versions.get(language_profile.command[0])
+    ):
+        return precheck(language_profile, code)
+    return lookup_precheck(language_profile, code)
+
+
+def _get_cache_key(language_profile: LanguageProfile, code: str) -> str:
+    """
+    Return the cache key for a precheck request.
+    """
+    key_data = repr((language_profile.name, language_profile.precheck_builtin, code))
+    if language_profile.precheck_builtin is None:
+        key_data += repr(language_profile.generate_precheck_command("", ""))
+    return sha256(key_data.encode()).hexdigest()
+
+
+def _precheck_python(
+    language_profile: LanguageProfile, code: str, priority: Priority
+) -> PrecheckResult:
+    """
+    Check Python code by compiling it without running it.
+
+    If the profile's interpreter is the same Python version as Functino's own, the code
+    is compiled in this process. Otherwise Functino's precheck script is run through the
+    profile's command, so that syntax that is only valid in the interpreter the code
+    runs with (e.g. a newer Python than Functino's own) isn't reported as an error.
+    """
+    if _is_this_interpreter(_get_interpreter_version(language_profile, priority)):
+        return _compile_python(code)
+    with TemporaryDirectory() as temp_dir_path, as_file(
+        get_scripts_path() / "python_precheck.py"
+    ) as precheck_script_path:
+        source_file_path = write_to_tmp_file(
+            code, language_profile.source_file_extension, temp_dir_path
+        )
+        output_path = os.path.join(temp_dir_path, "precheck.json")
+        command = language_profile.generate_helper_command(
+            str(precheck_script_path), (source_file_path, output_path)
+        )
+        _, stdout, stderr, _, _ = run_process(command, priority=priority)
+        try:
+            with open(output_path) as output_file:
+                precheck_data = json.load(output_file)
+        except (OSError, ValueError):
+            # The interpreter couldn't run the check, e.g. because it's missing.
+            output = (stderr + stdout).decode(errors="replace")
+            first_line = output.strip().splitlines()[0] if output.strip() else ""
+            return PrecheckResult(
+                (Diagnostic(0, 0, "error", first_line or "precheck failed"),), output
+            )
+    diagnostics = tuple(
+        Diagnostic(line, column, severity, message)
+        for line, column, severity, message in precheck_data["diagnostics"]
+    )
+    return PrecheckResult(diagnostics, precheck_data["output"])
+
+
+def _compile_python(code: str) -> PrecheckResult:
+    """
+    Check Python code by compiling it with the built-in compile function.
+    """
+    diagnostics = []
+    output = ""
+    with _compile_lock, warnings.catch_warnings(record=True) as caught_warnings:
+        warnings.simplefilter("always")
+        try:
+            compile(code, "<source>", "exec", dont_inherit=True)
+        except SyntaxError as e:
+            diagnostics.append(
+                Diagnostic(
+                    max((e.lineno or 1) - 1, 0),
+                    max((e.offset or 1) - 1, 0),
+                    "error",
+                    e.msg,
+                )
+            )
+            output = "".join(traceback.format_exception_only(e))
+        except ValueError as e:
+            # Raised for source code containing null bytes.
+            diagnostics.append(Diagnostic(0, 0, "error", str(e)))
+            output = str(e)
+    for caught_warning in caught_warnings:
+        if caught_warning.filename == "<source>":
+            diagnostics.append(
+                Diagnostic(
+                    caught_warning.lineno - 1,
+                    0,
+                    "warning",
+                    str(caught_warning.message),
+                )
+            )
+    return PrecheckResult(tuple(diagnostics), output)
+
+
+def _get_interpreter_version(
+    language_profile: LanguageProfile, priority: Priority
+) -> str | None:
+    """
+    Return the --version output of the profile's interpreter, or None if it can't be
+    determined.
+
+    The version is only queried once per interpreter; failed queries are retried on the
+    next check.
+    """
+    interpreter_program = language_profile.command[0]
+    interpreter_version = _interpreter_versions.get(interpreter_program)
+    if interpreter_version is None:
+        try:
+            returncode, stdout, stderr, _, _ = run_process(
+                (interpreter_program, "--version"), priority=priority
+            )
+        except OSError:
+            return None
+        if returncode != 0:
+            return None
+        interpreter_version = (stdout + stderr).decode(errors="replace").strip()
+        _interpreter_versions[interpreter_program] = interpreter_version
+    return interpreter_version
+
+
+def _is_this_interpreter(interpreter_version: str | None) -> bool:
+    """
+    Return whether an interpreter's --version output matches the Python that Functino
+    runs on, so that its syntax is the same.
+    """
+    return (
+        interpreter_version == f"Python {platform.python_version()}"
+        and platform.python_implementation() == "CPython"
+    )
+
+
+# Matches diagnostics in the "file:line:column: severity: message" format used by gcc,
+# clang and rustc (with --error-format=short).
+_diagnostic_regex = re.compile(
+    r"^(?P<file>.+?):(?P<line>\d+):(?P<column>\d+): (?:fatal )?"
+    r"(?P<severity>error|warning)(?:\[\w+\])?: (?P<message>.*)$",
+    re.MULTILINE,
+)
+
+
+def _run_precheck_command(
+    language_profile: LanguageProfile, code: str, priority: Priority
+) -> PrecheckResult:
+    """
+    Check code by running the profile's precheck command and parsing its diagnostics.
+
+    Dependencies declared by the code are built first, so that the check can resolve
+    them; if they fail to build, that's reported as an error on the first line.
+    """
+    crate_result = prepare_crates(language_profile, code, priority)
+    if crate_result is not None and crate_result.failed:
+        output = crate_result.output
+        first_line = output.strip().splitlines()[0] if output.strip() else ""
+        return PrecheckResult(
+            (Diagnostic(0, 0, "error", first_line or "failed to build dependencies"),),
+            output,
+        )
+    with TemporaryDirectory() as temp_dir_path:
+        source_file_path = write_to_tmp_file(
+            code, language_profile.source_file_extension, temp_dir_path
+        )
+        output_path = os.path.join(temp_dir_path, "precheck.out")
+        command = add_crate_args(
+            language_profile.generate_precheck_command(source_file_path, output_path),
+            crate_result,
+        )
+        returncode, stdout, stderr, _, _ = run_process(command, priority=priority)
+    output = (stderr + stdout).decode(errors="replace")
+    source_file_name = os.path.basename(source_file_path)
+    diagnostics = [
+        Diagnostic(
+            int(match["line"]) - 1,
+            int(match["column"]) - 1,
+            match["severity"],
+            match["message"],
+        )
+        for match in _diagnostic_regex.finditer(output)
+        if os.path.basename(match["file"]) == source_file_name
+    ]
+    if returncode != 0 and not any(d.severity == "error" for d in diagnostics):
+        # The check failed without an error we could place, e.g. a missing toolchain.
+        first_line = output.strip().splitlines()[0] if output.strip() else ""
+        diagnostics.append(Diagnostic(0, 0, "error", first_line or "precheck failed"))
+    return PrecheckResult(tuple(diagnostics), output)
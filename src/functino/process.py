@@ -0,0 +1,169 @@
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Sequence
+
+from functino.sample import ResourceSample, ResourceSampler
+from functino.schedule import Priority, get_scheduler
+from functino.trace import span
+
+
+class ProcessUsage:
+    """
+    The time and memory a finished process used.
+    """
+
+    def __init__(
+        self, wall_time: float, cpu_time: float | None, peak_rss_bytes: int | None
+    ) -> None:
+        self._wall_time = wall_time
+        self._cpu_time = cpu_time
+        self._peak_rss_bytes = peak_rss_bytes
+
+    @property
+    def wall_time(self) -> float:
+        """
+        Seconds between the start and the exit of the process.
+        """
+        return self._wall_time
+
+    @property
+    def cpu_time(self) -> float | None:
+        """
+        User and system CPU seconds used by the process and the descendants it waited
+        for, or None if the platform doesn't report it.
+        """
+        return self._cpu_time
+
+    @property
+    def peak_rss_bytes(self) -> int | None:
+        """
+        Peak resident set size of the process (or of its largest descendant), from the
+        OS or from the resource samples, or None if neither reports it.
+        """
+        return self._peak_rss_bytes
+
+
+def run_process(
+    command: Sequence[str],
+    sample_interval: float | None = None,
+    on_sample: Callable[[ResourceSample], None] | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> tuple[int, bytes, bytes, tuple[ResourceSample, ...], ProcessUsage]:
+    """
+    Run the given command to completion and return its return code, stdout, stderr,
+    resource samples and resource usage.
+
+    The process waits for a slot from the scheduler (see Scheduler) before it starts.
+    Lower priorities also lower the OS scheduling priority of the process and anything
+    it spawns.
+    """
+    with get_scheduler().slot(priority) as niceness:
+        return _run_process(command, sample_interval, on_sample, niceness)
+
+
+def apply_niceness(command: Sequence[str], niceness: int) -> tuple[Sequence[str], int]:
+    """
+    Return the command and Popen creation flags that start a process with the given
+    niceness, as yielded by Scheduler.slot.
+
+    A positive niceness lowers the scheduling priority of the process and anything it
+    spawns. On Windows, any positive niceness maps to the below normal priority class,
+    and the process never gets a console window.
+    """
+    creationflags = 0
+    if platform.system() == "Windows":
+        creationflags = subprocess.CREATE_NO_WINDOW  # type: ignore
+        if niceness > 0:
+            creationflags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS  # type: ignore
+    elif niceness > 0 and shutil.which("nice") is not None:
+        command = ("nice", "-n", str(niceness), *command)
+    return command, creationflags
+
+
+def _run_process(
+    command: Sequence[str],
+    sample_interval: float | None,
+    on_sample: Callable[[ResourceSample], None] | None,
+    niceness: int,
+) -> tuple[int, bytes, bytes, tuple[ResourceSample, ...], ProcessUsage]:
+    """
+    Run the given command with the given niceness (see apply_niceness).
+    """
+    command, creationflags = apply_niceness(command, niceness)
+    with span("spawn", command=command[0]):
+        start_time = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=False,
+            creationflags=creationflags,
+        )
+    with process:
+        sampler = None
+        if sample_interval is not None:
+            sampler = ResourceSampler(process.pid, sample_interval, on_sample)
+            sampler.start()
+        try:
+            with span("run", pid=process.pid):
+                if hasattr(os, "wait4"):
+                    stdout, stderr, cpu_time, peak_rss_bytes = _communicate(process)
+                else:
+                    stdout, stderr = process.communicate()
+                    cpu_time, peak_rss_bytes = None, None
+                wall_time = time.perf_counter() - start_time
+        finally:
+            if sampler is not None:
+                sampler.stop()
+    samples = sampler.samples if sampler is not None else ()
+    if samples:
+        peak_rss_bytes = (
+            max(peak_rss_bytes or 0, max(sample.rss_bytes for sample in samples))
+            or None
+        )
+    usage = ProcessUsage(wall_time, cpu_time, peak_rss_bytes)
+    return (process.returncode, stdout, stderr, samples, usage)
+
+
+def _communicate(
+    process: subprocess.Popen,
+) -> tuple[bytes, bytes, float, int | None]:
+    """
+    Read the output of a process until it exits, and reap it with os.wait4.
+
+    Returns its stdout, stderr, CPU seconds and peak RSS in bytes. Popen.communicate
+    can't be used here because it reaps the process without its resource usage.
+
+    On Linux, a child's peak RSS starts out as this process's RSS at the time of the
+    fork, so the peak RSS is only returned if it's higher than this process's own peak
+    (otherwise it's None).
+    """
+    import resource
+
+    assert process.stdout is not None and process.stderr is not None
+    stderr_chunks: list[bytes] = []
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_chunks.append(process.stderr.read()),  # type: ignore
+        daemon=True,
+    )
+    stderr_thread.start()
+    stdout = process.stdout.read()
+    stderr_thread.join()
+    _, status, rusage = os.wait4(process.pid, 0)  # type: ignore
+    process.returncode = os.waitstatus_to_exitcode(status)
+    peak_rss = rusage.ru_maxrss
+    if peak_rss <= resource.getrusage(resource.RUSAGE_SELF).ru_maxrss:
+        peak_rss = 0
+    # ru_maxrss is in bytes on macOS and in kibibytes elsewhere.
+    peak_rss_scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        stdout,
+        stderr_chunks[0],
+        rusage.ru_utime + rusage.ru_stime,
+        peak_rss * peak_rss_scale or None,
+    )
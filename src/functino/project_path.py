@@ -28,3 +28,10 @@ def get_themes_path() -> Traversable:
     Get path of themes directory.
     """
     return get_resources_path() / "themes"
+
+
+def get_scripts_path() -> Traversable:
+    """
+    Get path of the directory of helper scripts that are run by language toolchains.
+    """
+    return get_resources_path() / "scripts"
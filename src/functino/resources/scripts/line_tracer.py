@@ -0,0 +1,170 @@
+"""
+Run a Python script while counting the hits and cumulative time of each of its lines.
+
+Usage: python line_tracer.py SOURCE_FILE OUTPUT_FILE [ARGS...]
+
+The script runs as __main__ with ARGS as its arguments. When it exits, the statistics
+are written to OUTPUT_FILE as JSON, mapping each line number that was executed to a list
+of [hits, seconds]. The time of a line includes the time of everything it calls, so
+lines that call functions defined in the script are counted along with the lines of
+those functions.
+
+sys.monitoring is used on Python 3.12 and newer, and sys.settrace otherwise. This script
+is run by the interpreter of the language profile, so it must stay compatible with older
+Python versions and must not import anything from Functino.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+class LineTimer:
+    """
+    Accumulates hits and time per line from line start and frame exit events.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        # Maps each frame of the script that is executing to its current line and the
+        # time that line started.
+        self._current_lines = {}
+
+    def on_line(self, frame, line):
+        now = time.perf_counter()
+        self._finish_line(frame, now)
+        self._current_lines[frame] = (line, now)
+        line_stats = self.stats.get(line)
+        if line_stats is None:
+            self.stats[line] = [1, 0.0]
+        else:
+            line_stats[0] += 1
+
+    def on_exit(self, frame):
+        self._finish_line(frame, time.perf_counter())
+
+    def finish(self):
+        now = time.perf_counter()
+        for frame in list(self._current_lines):
+            self._finish_line(frame, now)
+
+    def _finish_line(self, frame, now):
+        current_line = self._current_lines.pop(frame, None)
+        if current_line is not None:
+            line, start = current_line
+            self.stats[line][1] += now - start
+
+
+def start_monitoring(timer, code):
+    """
+    Trace the code objects of the script with sys.monitoring.
+
+    Only the script's own code objects have local events enabled, so code outside the
+    script runs at full speed.
+    """
+    monitoring = sys.monitoring
+    tool_id = monitoring.PROFILER_ID
+    monitoring.use_tool_id(tool_id, "functino line tracer")
+    events = monitoring.events
+    script_codes = set()
+
+    def add_code(code):
+        script_codes.add(code)
+        monitoring.set_local_events(
+            tool_id, code, events.LINE | events.PY_RETURN | events.PY_YIELD
+        )
+        for constant in code.co_consts:
+            if isinstance(constant, type(code)):
+                add_code(constant)
+
+    def on_line(code, line):
+        timer.on_line(sys._getframe(1), line)
+
+    def on_exit(code, offset, value):
+        timer.on_exit(sys._getframe(1))
+
+    def on_unwind(code, offset, exception):
+        if code in script_codes:
+            timer.on_exit(sys._getframe(1))
+
+    monitoring.register_callback(tool_id, events.LINE, on_line)
+    monitoring.register_callback(tool_id, events.PY_RETURN, on_exit)
+    monitoring.register_callback(tool_id, events.PY_YIELD, on_exit)
+    monitoring.register_callback(tool_id, events.PY_UNWIND, on_unwind)
+    monitoring.set_events(tool_id, events.PY_UNWIND)
+    add_code(code)
+
+    def stop():
+        monitoring.set_events(tool_id, 0)
+        for script_code in script_codes:
+            monitoring.set_local_events(tool_id, script_code, 0)
+        monitoring.free_tool_id(tool_id)
+
+    return stop
+
+
+def start_settrace(timer, source_file_path):
+    """
+    Trace the frames of the script with sys.settrace (and threading.settrace).
+    """
+
+    def local_trace(frame, event, arg):
+        if event == "line":
+            timer.on_line(frame, frame.f_lineno)
+        elif event == "return":
+            timer.on_exit(frame)
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        if frame.f_code.co_filename == source_file_path:
+            return local_trace
+        return None
+
+    threading.settrace(global_trace)
+    sys.settrace(global_trace)
+
+    def stop():
+        sys.settrace(None)
+        threading.settrace(None)
+
+    return stop
+
+
+def main():
+    source_file_path, output_path = sys.argv[1:3]
+    sys.argv = [source_file_path] + sys.argv[3:]
+    sys.path[0] = os.path.dirname(source_file_path)
+    with open(source_file_path, "rb") as f:
+        code = compile(f.read(), source_file_path, "exec", dont_inherit=True)
+    script_globals = {
+        "__name__": "__main__",
+        "__file__": source_file_path,
+        "__builtins__": __builtins__,
+    }
+    timer = LineTimer()
+    if hasattr(sys, "monitoring"):
+        stop = start_monitoring(timer, code)
+    else:
+        stop = start_settrace(timer, source_file_path)
+    exit_code = 0
+    try:
+        exec(code, script_globals)
+    except SystemExit as e:
+        exit_code = e.code
+    except BaseException as e:
+        # Leave this script's frame out of the traceback.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        stop()
+        timer.finish()
+        with open(output_path, "w") as f:
+            json.dump(timer.stats, f)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
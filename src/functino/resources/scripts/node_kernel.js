@@ -0,0 +1,72 @@
+/*
+ * Run cells of JavaScript code in one persistent global scope, for Functino's session
+ * mode.
+ *
+ * Usage: node node_kernel.js TOKEN
+ *
+ * Each line read from stdin is a JSON request of the form {"id": ..., "line": ...,
+ * "code": ...}, where line is the zero-based line of the cell in the editor. The cell is
+ * run in the same global scope as all cells before it. After it finishes, the line
+ * "TOKEN:ID:STATUS" is written to both stdout and stderr, where STATUS is "ok" or
+ * "error", so that the cell's output can be told apart from the output of the next cell.
+ *
+ * Top-level let, const and class declarations are turned into var declarations so that
+ * cells declaring them can be run again.
+ */
+
+const { createRequire } = require("module");
+const path = require("path");
+const readline = require("readline");
+const vm = require("vm");
+
+const token = process.argv[2];
+globalThis.require = createRequire(path.join(process.cwd(), "cell.js"));
+
+function makeRedeclarable(code) {
+    return code
+        .replace(/^(?:let|const)(\s)/gm, "var$1")
+        .replace(/^class\s+([A-Za-z_$][\w$]*)/gm, "var $1 = class $1");
+}
+
+function formatError(error) {
+    if (!(error instanceof Error) || !error.stack) {
+        return `Uncaught ${String(error)}`;
+    }
+    // Leave the frames of this script and of the vm module out of the stack trace.
+    const stackLines = error.stack.split("\n");
+    const kernelFrameIndex = stackLines.findIndex(
+        (line) => line.includes("node:vm") || line.includes(__filename)
+    );
+    return stackLines
+        .slice(0, kernelFrameIndex < 0 ? undefined : kernelFrameIndex)
+        .join("\n");
+}
+
+async function runCell(request) {
+    try {
+        vm.runInThisContext(makeRedeclarable(request.code), {
+            filename: `cell ${request.id}`,
+            lineOffset: request.line,
+        });
+        // Let callbacks that are already due (e.g. resolved promises) run as part of
+        // the cell.
+        await new Promise((resolve) => setImmediate(resolve));
+        return "ok";
+    } catch (error) {
+        process.stderr.write(formatError(error) + "\n");
+        return "error";
+    }
+}
+
+async function main() {
+    const requests = readline.createInterface({ input: process.stdin });
+    for await (const requestLine of requests) {
+        const request = JSON.parse(requestLine);
+        const status = await runCell(request);
+        const doneLine = `${token}:${request.id}:${status}\n`;
+        process.stdout.write(doneLine);
+        process.stderr.write(doneLine);
+    }
+}
+
+main();
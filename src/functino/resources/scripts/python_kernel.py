@@ -0,0 +1,71 @@
+"""
+Run cells of Python code in one persistent namespace, for Functino's session mode.
+
+Usage: python python_kernel.py TOKEN
+
+Each line read from stdin is a JSON request of the form {"id": ..., "line": ...,
+"code": ...}, where line is the zero-based line of the cell in the editor. The cell is
+executed in the same namespace as all cells before it. After it finishes, the line
+"TOKEN:ID:STATUS" is written to both stdout and stderr, where STATUS is "ok", "error" or
+"exit", so that the cell's output can be told apart from the output of the next cell.
+
+This script is run by the interpreter of the language profile, so it must stay
+compatible with older Python versions and must not import anything from Functino.
+"""
+
+import json
+import linecache
+import os
+import sys
+import traceback
+
+
+def run_cell(cell_id, line, code, namespace):
+    """
+    Run a cell and return its status.
+    """
+    file_name = "<cell {}>".format(cell_id)
+    # Pad the cell so that line numbers in tracebacks match the editor, and register
+    # its source so that tracebacks can show the offending lines.
+    source = "\n" * line + code
+    linecache.cache[file_name] = (
+        len(source),
+        None,
+        source.splitlines(True),
+        file_name,
+    )
+    try:
+        exec(compile(source, file_name, "exec"), namespace)
+    except SystemExit:
+        return "exit"
+    except BaseException as e:
+        # Leave this script's frame out of the traceback.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return "error"
+    return "ok"
+
+
+def main():
+    token = sys.argv[1]
+    # Keep stdin for requests and give the cells an empty stdin instead.
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null_fd, 0)
+    sys.stdin = open(os.devnull)
+    sys.argv = [""]
+    sys.path[0] = os.getcwd()
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    for request_line in requests:
+        request = json.loads(request_line)
+        status = run_cell(request["id"], request["line"], request["code"], namespace)
+        done_line = "{}:{}:{}\n".format(token, request["id"], status)
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+            stream.write(done_line)
+            stream.flush()
+        if status == "exit":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Check a Python script for syntax errors and compile-time warnings without running it.
+
+Usage: python python_precheck.py SOURCE_FILE OUTPUT_FILE
+
+The diagnostics are written to OUTPUT_FILE as JSON of the form {"diagnostics": [[line,
+column, severity, message], ...], "output": ...}, where line and column are zero-based,
+severity is "error" or "warning" and output is the error formatted the way Python
+reports it.
+
+This script is run by the interpreter of the language profile, so that the check matches
+the Python version the code runs with. It must stay compatible with older Python
+versions and must not import anything from Functino.
+"""
+
+import json
+import sys
+import traceback
+import warnings
+
+
+def check(source):
+    """
+    Compile the source and return its diagnostics and error output.
+    """
+    diagnostics = []
+    output = ""
+    with warnings.catch_warnings(record=True) as caught_warnings:
+        warnings.simplefilter("always")
+        try:
+            compile(source, "<source>", "exec", dont_inherit=True)
+        except SyntaxError as e:
+            diagnostics.append(
+                [
+                    max((e.lineno or 1) - 1, 0),
+                    max((e.offset or 1) - 1, 0),
+                    "error",
+                    e.msg,
+                ]
+            )
+            output = "".join(traceback.format_exception_only(type(e), e))
+        except ValueError as e:
+            # Raised for source code containing null bytes.
+            diagnostics.append([0, 0, "error", str(e)])
+            output = str(e)
+    for caught_warning in caught_warnings:
+        if caught_warning.filename == "<source>":
+            diagnostics.append(
+                [caught_warning.lineno - 1, 0, "warning", str(caught_warning.message)]
+            )
+    return diagnostics, output
+
+
+def main():
+    source_file_path, output_path = sys.argv[1:3]
+    with open(source_file_path, "rb") as f:
+        source = f.read()
+    diagnostics, output = check(source)
+    with open(output_path, "w") as f:
+        json.dump({"diagnostics": diagnostics, "output": output}, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+
+
+class ResourceSample:
+    """
+    A single CPU and memory measurement of a process tree.
+    """
+
+    def __init__(self, elapsed: float, cpu_percent: float, rss_bytes: int) -> None:
+        self._elapsed = elapsed
+        self._cpu_percent = cpu_percent
+        self._rss_bytes = rss_bytes
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds between the start of sampling and this measurement.
+        """
+        return self._elapsed
+
+    @property
+    def cpu_percent(self) -> float:
+        """
+        CPU utilization of the process tree since the previous sample.
+
+        This value is relative to a single core, so it can exceed 100 for multithreaded
+        or multiprocess code.
+        """
+        return self._cpu_percent
+
+    @property
+    def rss_bytes(self) -> int:
+        """
+        Combined resident set size of the process tree.
+        """
+        return self._rss_bytes
+
+
+class ResourceSampler:
+    """
+    Periodically samples CPU and memory usage of a process and all of its descendants.
+
+    Sampling reads from /proc and is therefore only supported on Linux. On other
+    platforms, start() and stop() do nothing and no samples are collected.
+    """
+
+    def __init__(
+        self,
+        pid: int,
+        interval: float,
+        on_sample: Callable[[ResourceSample], None] | None = None,
+    ) -> None:
+        self._pid = pid
+        self._interval = interval
+        self._on_sample = on_sample
+        self._samples: list[ResourceSample] = []
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._previous_ticks: dict[int, int] = {}
+        self._previous_time = 0.0
+        self._start_time = 0.0
+
+    @property
+    def samples(self) -> tuple[ResourceSample, ...]:
+        """
+        All samples collected so far.
+        """
+        return tuple(self._samples)
+
+    def start(self) -> None:
+        """
+        Start sampling in a background thread.
+        """
+        if not is_sampling_supported():
+            return
+        self._start_time = time.monotonic()
+        self._previous_time = self._start_time
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the background thread to finish.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self) -> None:
+        """
+        Take samples until stopped or until the root process is gone.
+        """
+        while True:
+            if not self._take_sample():
+                return
+            if self._stop_event.wait(self._interval):
+                return
+
+    def _take_sample(self) -> bool:
+        """
+        Record one sample of the process tree.
+
+        Returns False if the root process no longer exists.
+        """
+        stats = {}
+        for pid in _get_process_tree(self._pid):
+            stat = _read_process_stat(pid)
+            if stat is not None:
+                stats[pid] = stat
+        if self._pid not in stats:
+            return False
+        now = time.monotonic()
+        cpu_ticks = 0
+        for pid, (ticks, _) in stats.items():
+            cpu_ticks += max(ticks - self._previous_ticks.get(pid, 0), 0)
+        wall_seconds = now - self._previous_time
+        cpu_percent = 0.0
+        if wall_seconds > 0:
+            cpu_percent = cpu_ticks / _CLOCK_TICKS / wall_seconds * 100
+        rss_bytes = sum(rss for _, rss in stats.values())
+        self._previous_ticks = {pid: ticks for pid, (ticks, _) in stats.items()}
+        self._previous_time = now
+        sample = ResourceSample(now - self._start_time, cpu_percent, rss_bytes)
+        self._samples.append(sample)
+        if self._on_sample is not None:
+            self._on_sample(sample)
+        return True
+
+
+def is_sampling_supported() -> bool:
+    """
+    Return whether process resource sampling is supported on this platform.
+    """
+    return os.path.isfile("/proc/self/stat")
+
+
+if is_sampling_supported():
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _get_process_tree(root_pid: int) -> list[int]:
+    """
+    Return the given pid along with the pids of all of its descendants.
+    """
+    pids = [root_pid]
+    i = 0
+    while i < len(pids):
+        pids.extend(_get_child_pids(pids[i]))
+        i += 1
+    return pids
+
+
+def _get_child_pids(pid: int) -> list[int]:
+    """
+    Return the pids of the direct children of the given process.
+    """
+    child_pids = []
+    try:
+        for task_path in Path(f"/proc/{pid}/task").iterdir():
+            child_pids.extend(map(int, (task_path / "children").read_text().split()))
+    except OSError:
+        pass
+    return child_pids
+
+
+def _read_process_stat(pid: int) -> tuple[int, int] | None:
+    """
+    Return the total CPU ticks and resident set size in bytes of the given process, or
+    None if the process no longer exists.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name field can contain spaces and parentheses, so only split the
+    # fields that come after it.
+    fields = stat[stat.rfind(b")") + 2 :].split()
+    utime, stime, rss_pages = int(fields[11]), int(fields[12]), int(fields[21])
+    return (utime + stime, rss_pages * _PAGE_SIZE)
@@ -0,0 +1,230 @@
+from contextlib import contextmanager
+from enum import IntEnum
+import heapq
+from itertools import count
+import os
+import threading
+import time
+from typing import Iterator
+
+from functino.trace import counter, span
+
+
+class Priority(IntEnum):
+    """
+    Scheduling priority of a process. Lower values are scheduled first.
+    """
+
+    # Runs that the user is waiting for.
+    INTERACTIVE = 0
+    # Work the user asked for that isn't a run (e.g. generated code views).
+    BATCH = 1
+    # Speculative work the user didn't ask for (e.g. compiling while typing pauses).
+    BACKGROUND = 2
+
+
+# The niceness applied to the processes of each priority (see run_process).
+_PRIORITY_NICENESS = {
+    Priority.INTERACTIVE: 0,
+    Priority.BATCH: 5,
+    Priority.BACKGROUND: 10,
+}
+
+
+class SchedulerStats:
+    """
+    Snapshot of the queue and wait-time statistics of one priority class.
+    """
+
+    def __init__(
+        self,
+        priority: Priority,
+        queued: int,
+        running: int,
+        started: int,
+        total_wait_time: float,
+        max_wait_time: float,
+    ) -> None:
+        self._priority = priority
+        self._queued = queued
+        self._running = running
+        self._started = started
+        self._total_wait_time = total_wait_time
+        self._max_wait_time = max_wait_time
+
+    @property
+    def priority(self) -> Priority:
+        """
+        The priority class these statistics are for.
+        """
+        return self._priority
+
+    @property
+    def queued(self) -> int:
+        """
+        The number of processes waiting for a slot.
+        """
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        """
+        The number of processes holding a slot.
+        """
+        return self._running
+
+    @property
+    def started(self) -> int:
+        """
+        The total number of processes that got a slot.
+        """
+        return self._started
+
+    @property
+    def total_wait_time(self) -> float:
+        """
+        The total time in seconds that started processes waited for a slot.
+        """
+        return self._total_wait_time
+
+    @property
+    def max_wait_time(self) -> float:
+        """
+        The longest time in seconds that a started process waited for a slot.
+        """
+        return self._max_wait_time
+
+    @property
+    def mean_wait_time(self) -> float:
+        """
+        The mean time in seconds that started processes waited for a slot.
+        """
+        return self._total_wait_time / self._started if self._started else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self._priority.name.lower()}: {self._running} running,"
+            f" {self._queued} queued, {self._started} started,"
+            f" wait mean {self.mean_wait_time * 1000:.1f} ms"
+            f" max {self._max_wait_time * 1000:.1f} ms"
+        )
+
+
+class Scheduler:
+    """
+    Limits how many processes Functino runs at once and decides which runs next.
+
+    Every process Functino spawns (runs, compiles, code generation, prechecks) waits
+    for a slot from the scheduler. Waiting processes get slots in priority order, then
+    in the order they asked for one. Unless the limit is 1, one slot is kept free for
+    interactive runs, so background work can never make the user wait for a slot.
+    """
+
+    def __init__(self, max_concurrency: int | None = None) -> None:
+        self._max_concurrency = max_concurrency or os.cpu_count() or 1
+        self._condition = threading.Condition()
+        # Heap of (priority, ticket number) of the processes waiting for a slot.
+        self._queue: list[tuple[Priority, int]] = []
+        self._ticket_numbers = count()
+        self._running = dict.fromkeys(Priority, 0)
+        self._started = dict.fromkeys(Priority, 0)
+        self._total_wait_times = dict.fromkeys(Priority, 0.0)
+        self._max_wait_times = dict.fromkeys(Priority, 0.0)
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        The maximum number of processes that run at once.
+        """
+        return self._max_concurrency
+
+    @max_concurrency.setter
+    def max_concurrency(self, value: int | None) -> None:
+        """
+        Set the maximum number of processes that run at once, or reset it to the
+        number of CPU cores if value is None or 0.
+        """
+        with self._condition:
+            self._max_concurrency = max(value or os.cpu_count() or 1, 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Priority) -> Iterator[int]:
+        """
+        Wait for a free slot and hold it until the block exits.
+
+        Yields the niceness that the process should run with.
+        """
+        ticket = (priority, next(self._ticket_numbers))
+        enqueue_time = time.perf_counter()
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            if not self._can_start(ticket):
+                with span("queue wait", priority=priority.name.lower()):
+                    self._record_counters()
+                    while not self._can_start(ticket):
+                        self._condition.wait()
+            heapq.heappop(self._queue)
+            wait_time = time.perf_counter() - enqueue_time
+            self._running[priority] += 1
+            self._started[priority] += 1
+            self._total_wait_times[priority] += wait_time
+            self._max_wait_times[priority] = max(
+                self._max_wait_times[priority], wait_time
+            )
+            self._record_counters()
+            # The next process in the queue may be able to start as well.
+            self._condition.notify_all()
+        try:
+            yield _PRIORITY_NICENESS[priority]
+        finally:
+            with self._condition:
+                self._running[priority] -= 1
+                self._record_counters()
+                self._condition.notify_all()
+
+    def stats(self) -> tuple[SchedulerStats, ...]:
+        """
+        Return the current statistics of each priority class.
+        """
+        with self._condition:
+            return tuple(
+                SchedulerStats(
+                    priority,
+                    sum(1 for queued, _ in self._queue if queued == priority),
+                    self._running[priority],
+                    self._started[priority],
+                    self._total_wait_times[priority],
+                    self._max_wait_times[priority],
+                )
+                for priority in Priority
+            )
+
+    def _can_start(self, ticket: tuple[Priority, int]) -> bool:
+        """
+        Return whether the process with the given ticket can take a slot now.
+        """
+        if self._queue[0] != ticket:
+            return False
+        limit = self._max_concurrency
+        if ticket[0] != Priority.INTERACTIVE and limit > 1:
+            limit -= 1
+        return sum(self._running.values()) < limit
+
+    def _record_counters(self) -> None:
+        """
+        Record the number of running and queued processes in the trace.
+        """
+        counter(
+            "scheduler", running=sum(self._running.values()), queued=len(self._queue)
+        )
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    """
+    Return the scheduler shared by everything in this process.
+    """
+    return _scheduler
@@ -0,0 +1,317 @@
+from contextlib import ExitStack
+from importlib.abc import Traversable
+from importlib.resources import as_file
+from itertools import count
+import json
+import secrets
+import subprocess
+import threading
+from typing import IO, Callable
+
+from functino.execute import RunResult
+from functino.language import LanguageProfile
+from functino.process import apply_niceness
+from functino.project_path import get_scripts_path
+from functino.sample import ResourceSample, ResourceSampler
+from functino.schedule import Priority, get_scheduler
+from functino.trace import span
+
+
+class Cell:
+    """
+    A cell of code in session mode.
+    """
+
+    def __init__(self, code: str, line: int) -> None:
+        self._code = code
+        self._line = line
+
+    @property
+    def code(self) -> str:
+        """
+        The code of the cell, including its marker comment.
+        """
+        return self._code
+
+    @property
+    def line(self) -> int:
+        """
+        The zero-based line of the source code that the cell starts on.
+        """
+        return self._line
+
+
+class CellResult:
+    """
+    The output of running a cell in a session.
+    """
+
+    def __init__(self, stdout: str, stderr: str, failed: bool) -> None:
+        self._stdout = stdout
+        self._stderr = stderr
+        self._failed = failed
+
+    @property
+    def stdout(self) -> str:
+        """
+        The stdout of the cell.
+        """
+        return self._stdout
+
+    @property
+    def stderr(self) -> str:
+        """
+        The stderr of the cell.
+        """
+        return self._stderr
+
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the cell raised an error or ended the session.
+        """
+        return self._failed
+
+
+def split_cells(code: str, cell_marker: str) -> tuple[Cell, ...]:
+    """
+    Split code into cells at each line that starts with the cell marker.
+
+    Code before the first marker forms a cell of its own.
+    """
+    cells = []
+    cell_lines: list[str] = []
+    cell_start = 0
+    for i, line in enumerate(code.splitlines(keepends=True)):
+        if cell_marker and line.lstrip().startswith(cell_marker) and cell_lines:
+            cells.append(Cell("".join(cell_lines), cell_start))
+            cell_lines = []
+            cell_start = i
+        cell_lines.append(line)
+    if cell_lines:
+        cells.append(Cell("".join(cell_lines), cell_start))
+    return tuple(cells)
+
+
+class Session:
+    """
+    Persistent interpreter that runs code cell by cell.
+
+    Running code again only re-runs the first changed cell and the cells after it;
+    the interpreter keeps the state of the cells before it in memory. If a cell fails,
+    the cells after it are skipped, and the failed cell is run again next time.
+    """
+
+    def __init__(self, language_profile: LanguageProfile) -> None:
+        if language_profile.session_builtin is None:
+            raise RuntimeError(f"profile '{language_profile.name}' has no session")
+        self._language_profile = language_profile
+        self._run_lock = threading.Lock()
+        self._kernel: _Kernel | None = None
+        self._completed_cells: list[tuple[str, CellResult]] = []
+
+    def run(
+        self,
+        code: str,
+        sample_interval: float | None = None,
+        on_sample: Callable[[ResourceSample], None] | None = None,
+    ) -> RunResult:
+        """
+        Run the changed cells of the code and return the output of all cells.
+
+        The output of unchanged cells is the output they had when they last ran.
+        Sampling works like in get_output, but only covers the cells that run.
+        """
+        with self._run_lock:
+            cells = split_cells(code, self._language_profile.session_cell_marker)
+            if self._kernel is None or not self._kernel.is_alive():
+                self._start_kernel()
+            kernel = self._kernel
+            assert kernel is not None
+            unchanged_cell_count = 0
+            for cell, (completed_code, _) in zip(cells, self._completed_cells):
+                if cell.code != completed_code:
+                    break
+                unchanged_cell_count += 1
+            del self._completed_cells[unchanged_cell_count:]
+            cell_results = [result for _, result in self._completed_cells]
+            sampler = None
+            if sample_interval is not None:
+                sampler = ResourceSampler(kernel.pid, sample_interval, on_sample)
+                sampler.start()
+            try:
+                for cell in cells[unchanged_cell_count:]:
+                    with get_scheduler().slot(Priority.INTERACTIVE), span(
+                        "session cell", line=cell.line
+                    ):
+                        cell_result = kernel.run_cell(cell)
+                    cell_results.append(cell_result)
+                    if cell_result.failed:
+                        break
+                    self._completed_cells.append((cell.code, cell_result))
+            finally:
+                if sampler is not None:
+                    sampler.stop()
+            if not kernel.is_alive():
+                self._completed_cells.clear()
+            return RunResult(
+                "".join(result.stdout for result in cell_results),
+                "".join(result.stderr for result in cell_results),
+                sampler.samples if sampler is not None else (),
+            )
+
+    def restart(self) -> None:
+        """
+        Stop the interpreter and forget all state; the next run starts from scratch.
+
+        A cell that is running is interrupted.
+        """
+        kernel = self._kernel
+        if kernel is not None:
+            kernel.stop()
+        with self._run_lock:
+            self._kernel = None
+            self._completed_cells.clear()
+
+    def _start_kernel(self) -> None:
+        """
+        Start a new interpreter.
+        """
+        with span("session start"):
+            self._kernel = _Kernel(self._language_profile)
+        self._completed_cells.clear()
+
+
+class _Kernel:
+    """
+    A running kernel script that runs cells on request.
+
+    See the kernel scripts in the scripts resource directory for the protocol.
+    """
+
+    def __init__(self, language_profile: LanguageProfile) -> None:
+        self._token = secrets.token_hex(16)
+        self._cell_ids = count()
+        self._exit_stack = ExitStack()
+        kernel_path = self._exit_stack.enter_context(
+            as_file(_get_kernel_path(language_profile))
+        )
+        command = language_profile.generate_helper_command(
+            str(kernel_path), (self._token,)
+        )
+        # Starting the kernel counts against the process limit like any other spawn.
+        # An idle kernel doesn't hold a slot; each cell holds one while it runs.
+        with get_scheduler().slot(Priority.INTERACTIVE) as niceness:
+            command, creationflags = apply_niceness(command, niceness)
+            self._process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                shell=False,
+                creationflags=creationflags,
+            )
+        self._condition = threading.Condition()
+        # The output of each stream that hasn't been claimed by a cell yet, and whether
+        # the stream has been closed.
+        self._buffers = [bytearray(), bytearray()]
+        self._closed = [False, False]
+        assert self._process.stdout is not None and self._process.stderr is not None
+        for i, stream in enumerate((self._process.stdout, self._process.stderr)):
+            threading.Thread(target=self._read, args=(i, stream), daemon=True).start()
+
+    @property
+    def pid(self) -> int:
+        """
+        The process ID of the kernel.
+        """
+        return self._process.pid
+
+    def is_alive(self) -> bool:
+        """
+        Return whether the kernel is still running.
+        """
+        return self._process.poll() is None
+
+    def run_cell(self, cell: Cell) -> CellResult:
+        """
+        Run a cell and wait for its output.
+        """
+        cell_id = next(self._cell_ids)
+        request = {"id": cell_id, "line": cell.line, "code": cell.code}
+        assert self._process.stdin is not None
+        try:
+            self._process.stdin.write(json.dumps(request).encode() + b"\n")
+            self._process.stdin.flush()
+        except OSError:
+            pass
+        done_prefix = f"{self._token}:{cell_id}:".encode()
+        outputs: list[str] = []
+        statuses: list[str] = []
+        with self._condition:
+            self._condition.wait_for(
+                lambda: all(
+                    done_prefix in buffer or closed
+                    for buffer, closed in zip(self._buffers, self._closed)
+                )
+            )
+            for buffer in self._buffers:
+                done_index = buffer.find(done_prefix)
+                if done_index < 0:
+                    outputs.append(buffer.decode(errors="replace"))
+                    statuses.append("")
+                    buffer.clear()
+                    continue
+                line_end = buffer.find(b"\n", done_index)
+                outputs.append(buffer[:done_index].decode(errors="replace"))
+                statuses.append(
+                    buffer[done_index + len(done_prefix) : line_end].decode()
+                )
+                del buffer[: line_end + 1]
+        stdout, stderr = outputs
+        failed = statuses[0] != "ok"
+        if not all(statuses):
+            stderr += "session ended\n"
+            self.stop()
+        elif statuses[0] == "exit":
+            self.stop()
+        return CellResult(stdout, stderr, failed)
+
+    def stop(self) -> None:
+        """
+        Stop the kernel.
+        """
+        self._process.kill()
+        self._process.wait()
+        for stream in (self._process.stdin, self._process.stdout, self._process.stderr):
+            if stream is not None:
+                stream.close()
+        self._exit_stack.close()
+
+    def _read(self, stream_index: int, stream: IO[bytes]) -> None:
+        """
+        Collect the output of one of the kernel's streams until it's closed.
+        """
+        try:
+            while chunk := stream.read1(65536):  # type: ignore
+                with self._condition:
+                    self._buffers[stream_index] += chunk
+                    self._condition.notify_all()
+        except (OSError, ValueError):
+            pass
+        with self._condition:
+            self._closed[stream_index] = True
+            self._condition.notify_all()
+
+
+def _get_kernel_path(language_profile: LanguageProfile) -> Traversable:
+    """
+    Return the path of the kernel script of the given profile.
+    """
+    match language_profile.session_builtin:
+        case "python":
+            return get_scripts_path() / "python_kernel.py"
+        case "node":
+            return get_scripts_path() / "node_kernel.js"
+        case builtin:
+            raise RuntimeError(f"unknown built-in session kernel '{builtin}'")
@@ -0,0 +1,216 @@
+from collections import deque
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+from types import TracebackType
+from typing import Any, Iterable, Iterator
+
+# Spans are recorded when tracing is enabled globally or when a thread is recording
+# spans with record_spans. This counts both, so that span can bail out early with a
+# single check when tracing is off.
+_recorder_count = 0
+_tracing_enabled = False
+_MAX_EVENTS = 100000
+_events: deque[dict[str, Any]] = deque(maxlen=_MAX_EVENTS)
+_thread_names: dict[tuple[int, int], str] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span:
+    """
+    A timed section of work, recorded as a complete event in Chrome trace format.
+
+    The span starts when it's created and ends when it's used as a context manager and
+    the block exits, or when finish is called.
+    """
+
+    __slots__ = ("_name", "_args", "_start")
+
+    def __init__(self, name: str, args: dict[str, Any]) -> None:
+        self._name = name
+        self._args = args
+        self._start = time.perf_counter_ns()
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.finish()
+
+    def set_arg(self, key: str, value: Any) -> None:
+        """
+        Attach an argument to the span, which is shown in the trace viewer.
+        """
+        self._args[key] = value
+
+    def finish(self) -> None:
+        """
+        End the span and record it.
+        """
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        event = {
+            "name": self._name,
+            "cat": "functino",
+            "ph": "X",
+            # Chrome trace timestamps are in microseconds.
+            "ts": self._start / 1000,
+            "dur": (end - self._start) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.native_id,
+            "args": self._args,
+        }
+        local_events: list[dict[str, Any]] | None = getattr(_local, "events", None)
+        if local_events is not None:
+            local_events.append(event)
+        elif _tracing_enabled:
+            with _lock:
+                _events.append(event)
+                _thread_names[(os.getpid(), event["tid"])] = thread.name
+
+
+class _NullSpan(Span):
+    """
+    Span that records nothing, used while tracing is off.
+    """
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        pass
+
+    def set_arg(self, key: str, value: Any) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args: Any) -> Span:
+    """
+    Start a span with the given name and arguments.
+
+    When tracing is off, this returns a shared span that does nothing, so instrumented
+    code costs next to nothing.
+    """
+    if not _recorder_count:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def counter(name: str, **values: float) -> None:
+    """
+    Record the current values of a counter (e.g. a queue length) into the global trace.
+
+    Counters are shown as graphs in the trace viewer.
+    """
+    if not _tracing_enabled:
+        return
+    event = {
+        "name": name,
+        "cat": "functino",
+        "ph": "C",
+        "ts": time.perf_counter_ns() / 1000,
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "args": values,
+    }
+    with _lock:
+        _events.append(event)
+
+
+def is_tracing_enabled() -> bool:
+    """
+    Return whether spans are recorded into the global trace.
+    """
+    return _tracing_enabled
+
+
+def set_tracing_enabled(enabled: bool) -> None:
+    """
+    Enable or disable recording spans into the global trace.
+    """
+    global _recorder_count, _tracing_enabled
+    with _lock:
+        if enabled != _tracing_enabled:
+            _recorder_count += 1 if enabled else -1
+            _tracing_enabled = enabled
+
+
+@contextmanager
+def record_spans() -> Iterator[list[dict[str, Any]]]:
+    """
+    Record the spans finished by the current thread into the yielded list instead of
+    the global trace, whether or not tracing is enabled.
+
+    This is used to pass the spans of a single job on to another process.
+    """
+    global _recorder_count
+    events: list[dict[str, Any]] = []
+    previous_events = getattr(_local, "events", None)
+    _local.events = events
+    with _lock:
+        _recorder_count += 1
+    try:
+        yield events
+    finally:
+        with _lock:
+            _recorder_count -= 1
+        _local.events = previous_events
+
+
+def add_trace_events(events: Iterable[dict[str, Any]]) -> None:
+    """
+    Add events recorded elsewhere (e.g. by the execution daemon) to the global trace.
+    """
+    if not _tracing_enabled:
+        return
+    with _lock:
+        _events.extend(events)
+
+
+def clear_trace() -> None:
+    """
+    Discard all events in the global trace.
+    """
+    with _lock:
+        _events.clear()
+        _thread_names.clear()
+
+
+def export_trace(file_path: str) -> None:
+    """
+    Write the global trace to the given file as Chrome trace JSON.
+
+    The file can be opened in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+    Only the most recent events are kept if the trace grows too large.
+    """
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    metadata_events = [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": thread_name},
+        }
+        for (pid, tid), thread_name in thread_names.items()
+    ]
+    trace = {"traceEvents": metadata_events + events, "displayTimeUnit": "ms"}
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "w") as f:
+        json.dump(trace, f)
+    os.replace(temp_file_path, file_path)